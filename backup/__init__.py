@@ -1,4 +1,7 @@
 from .cloud_drive_folder_uploader import *
 from .chunk_partitioner import *
+from .zip_stream import *
+from .incremental_backup import *
 
-__all__ = cloud_drive_folder_uploader.__all__ + chunk_partitioner.__all__
+__all__ = cloud_drive_folder_uploader.__all__ + chunk_partitioner.__all__ + zip_stream.__all__ + \
+          incremental_backup.__all__
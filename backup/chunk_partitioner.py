@@ -6,19 +6,25 @@ __all__ = ['ChunkPartitioner']
 
 
 class ChunkPartitioner(object):
-    def __init__(self, filename, msg, chunk_size=8 * 1024):
+    def __init__(self, filename, msg, chunk_size=1024 * 1024, offset=0, length=None, tracker: ProgressTracker = None):
         self._filename = filename
         self._chunk_size = chunk_size
-        self._total_size = os.path.getsize(filename)
-        self._tracker = ProgressTracker(self._total_size, msg)
+        self._offset = offset
+        self._total_size = os.path.getsize(filename) - offset if length is None else length
+        self._own_tracker = tracker is None
+        self._tracker = ProgressTracker(self._total_size, msg) if tracker is None else tracker
 
     def __iter__(self):
         with open(self._filename, 'rb') as file:
+            file.seek(self._offset)
+            left = self._total_size
             while True:
-                data = file.read(self._chunk_size)
+                data = file.read(min(self._chunk_size, left))
                 if not data:
-                    self._tracker.close()
+                    if self._own_tracker:
+                        self._tracker.close()
                     break
+                left -= len(data)
                 self._tracker.add_progress(len(data))
                 yield data
 
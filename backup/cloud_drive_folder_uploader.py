@@ -1,7 +1,11 @@
 from ui import ui
 from os import remove
+from os.path import abspath
 from utils import get_size
 from shutil import make_archive
+from settings import get_backup_mode, get_backup_workers, get_webdav_url, get_upload_chunk_size, get_upload_retries
+from .zip_stream import ZipStream
+from .incremental_backup import IncrementalBackup
 from .ya_disk import YaDiskWithProgress
 from YaDiskClient.YaDiskClient import YaDiskException
 
@@ -12,7 +16,7 @@ class Uploader:
     root_folder = 'music library'
 
     def __init__(self, login, password):
-        self._disk = YaDiskWithProgress(login, password)
+        self._disk = YaDiskWithProgress(login, password, get_webdav_url(), get_upload_chunk_size(), get_upload_retries())
         try:
             self._available_space = int(self._disk.df()['available'])
         except YaDiskException as e:
@@ -27,12 +31,30 @@ class Uploader:
         return f'/{self.root_folder}'
 
     def upload(self, folder):
+        mode = get_backup_mode()
+        if mode == 'incremental':
+            IncrementalBackup(self._disk, self.root, folder, get_backup_workers()).run(self._available_space)
+            return
         size = get_size(folder)
         if size > self._available_space:
             raise ValueError('Not enough space')
-        ui.show('Zipping library')
-        archive = make_archive('__library__', 'zip', root_dir=folder)
-        ui.show('Successfully zipped')
+        if mode == 'stream':
+            self._upload_stream(folder)
+        else:
+            self._upload_archive(folder)
+
+    def _upload_stream(self, folder):
+        ui.show('Start uploading')
+        self._disk.upload_stream(ZipStream(folder, 'Uploading library'), f'{self.root}/library.zip')
+
+    def _upload_archive(self, folder):
+        archive = abspath('__library__.zip')
+        destination = f'{self.root}/library.zip'
+        if not (self._disk.has_unfinished_upload(archive, destination) and
+                ui.ask_ok('Found unfinished library upload, resume it?')):
+            ui.show('Zipping library')
+            archive = make_archive('__library__', 'zip', root_dir=folder)
+            ui.show('Successfully zipped')
         ui.show('Start uploading')
-        self._disk.upload(archive, f'{self.root}/library.zip')
+        self._disk.upload(archive, destination)
         remove(archive)
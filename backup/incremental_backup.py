@@ -0,0 +1,166 @@
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Dict
+from ui import ui
+from utils import ProgressTracker
+from .zip_stream import ZipStream
+from .ya_disk import YaDiskWithProgress
+from YaDiskClient.YaDiskClient import YaDiskException
+
+__all__ = ['IncrementalBackup']
+
+
+def fingerprint_album(path: Path):
+    result = hashlib.sha1()
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for name in sorted(filenames):
+            file = os.path.join(dirpath, name)
+            st = os.stat(file)
+            size += st.st_size
+            result.update(f'{os.path.relpath(file, path)}\0{st.st_size}\0{st.st_mtime_ns}\n'.encode())
+    return result.hexdigest(), size
+
+
+def fingerprint_file(path: Path):
+    st = path.stat()
+    return hashlib.sha1(f'{st.st_size}\0{st.st_mtime_ns}'.encode()).hexdigest(), st.st_size
+
+
+def snapshot_database(path: Path, dest):
+    # an open read transaction keeps writers (e.g. a finished download) out while the file is copied
+    with closing(sqlite3.connect(str(path))) as connection:
+        connection.execute('BEGIN')
+        connection.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        shutil.copyfile(str(path), dest)
+        connection.rollback()
+
+
+class IncrementalBackup:
+    manifest_name = 'manifest.json'
+    local_manifest_name = 'library.backup.json'
+    metadata_names = ('library.db',)
+    chunk_size = 1024 * 1024
+
+    def __init__(self, disk: YaDiskWithProgress, root, folder, workers=4):
+        self._disk = disk
+        self._root = root
+        self._folder = Path(folder)
+        self._workers = max(1, workers)
+        self._lock = Lock()
+        self._local_manifest = self._folder.joinpath(self.local_manifest_name)
+        data = self._load_manifest()
+        self._manifest: Dict[str, dict] = data['albums']
+        self._files: Dict[str, dict] = data['files']
+
+    def _load_manifest(self):
+        try:
+            data = json.loads(self._disk.read(f'{self._root}/{self.manifest_name}').decode())
+            return {'albums': data['albums'], 'files': data.get('files', {})}
+        except (YaDiskException, ValueError, KeyError):
+            pass
+        if self._local_manifest.exists():
+            with self._local_manifest.open() as f:
+                data = json.load(f)
+            return {'albums': data['albums'], 'files': data.get('files', {})}
+        return {'albums': {}, 'files': {}}
+
+    def _save_manifest(self, remote=False):
+        data = json.dumps({'version': 1, 'albums': self._manifest, 'files': self._files},
+                          separators=(',', ':')).encode()
+        with self._local_manifest.open('wb') as f:
+            f.write(data)
+        if remote:
+            self._disk.upload_stream([data], f'{self._root}/{self.manifest_name}')
+
+    def _get_albums(self):
+        for performer in (p for p in self._folder.iterdir() if p.is_dir()):
+            for album in (p for p in performer.iterdir() if p.is_dir()):
+                yield album.relative_to(self._folder).as_posix(), album
+
+    def _get_metadata(self):
+        for name in self.metadata_names:
+            path = self._folder.joinpath(name)
+            if path.is_file():
+                yield name, path
+
+    def _remote_path(self, location):
+        return f'{self._root}/{location}.zip'
+
+    def plan(self):
+        albums = dict(self._get_albums())
+        with ThreadPoolExecutor(self._workers) as pool:
+            fingerprints = dict(zip(albums, pool.map(fingerprint_album, albums.values())))
+        changed = {location: fingerprints[location] for location in albums
+                   if self._manifest.get(location, {}).get('hash') != fingerprints[location][0]}
+        removed = [location for location in self._manifest if location not in albums]
+        return albums, changed, removed
+
+    def plan_metadata(self):
+        metadata = dict(self._get_metadata())
+        fingerprints = {name: fingerprint_file(path) for name, path in metadata.items()}
+        return {name: fingerprint for name, fingerprint in fingerprints.items()
+                if self._files.get(name, {}).get('hash') != fingerprint[0]}
+
+    def _upload_album(self, location, path, fingerprint, tracker):
+        file_hash, size = fingerprint
+        self._disk.upload_stream(ZipStream(str(path), location, tracker=tracker), self._remote_path(location))
+        with self._lock:
+            self._manifest[location] = {'hash': file_hash, 'size': size}
+            self._save_manifest()
+
+    def _upload_metadata(self, name, fingerprint):
+        file_hash, size = fingerprint
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot = os.path.join(tmp, name)
+            snapshot_database(self._folder.joinpath(name), snapshot)
+            with open(snapshot, 'rb') as f:
+                self._disk.upload_stream(iter(lambda: f.read(self.chunk_size), b''), f'{self._root}/{name}')
+        self._files[name] = {'hash': file_hash, 'size': size}
+
+    def run(self, available_space):
+        albums, changed, removed = self.plan()
+        metadata = self.plan_metadata()
+        if len(changed) == 0 and len(removed) == 0 and len(metadata) == 0:
+            ui.show('Backup is up to date')
+            return
+        total_size = sum(size for _, size in changed.values()) + sum(size for _, size in metadata.values())
+        if total_size > available_space:
+            raise ValueError('Not enough space')
+
+        for location in removed:
+            try:
+                self._disk.rm(self._remote_path(location))
+            except YaDiskException as e:
+                if e.code != 404:
+                    raise
+            del self._manifest[location]
+
+        for performer in {location.split('/')[0] for location in changed}:
+            self._disk.ensure_dir(f'{self._root}/{performer}')
+        ui.show(f'Uploading {len(changed)} albums, removing {len(removed)}')
+        tracker = ProgressTracker(max(1, total_size), 'Uploading library')
+        try:
+            with ThreadPoolExecutor(self._workers) as pool:
+                futures = [pool.submit(self._upload_album, location, albums[location], fingerprint, tracker)
+                           for location, fingerprint in changed.items()]
+                for future in futures:
+                    try:
+                        future.result()
+                    except YaDiskException as e:
+                        ui.show(f'Failed to upload album: {e}')
+            # the library database goes after the albums it describes
+            for name, fingerprint in metadata.items():
+                self._upload_metadata(name, fingerprint)
+        finally:
+            tracker.close()
+            self._save_manifest(remote=True)
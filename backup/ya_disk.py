@@ -1,9 +1,143 @@
+import os
+import json
+from time import sleep
+from random import uniform
+from requests import RequestException
 from YaDiskClient.YaDiskClient import YaDisk, YaDiskException
+from ui import ui
+from utils import ProgressTracker
 from .chunk_partitioner import ChunkPartitioner
 
+PARTIAL_UPLOAD_REJECTED = (400, 405, 411, 416, 501)
+# WebDAV answers 201 for a new file and 204 (or 200) for an overwritten one
+UPLOAD_SUCCEEDED = (200, 201, 204)
+
+
+class UploadCheckpoint:
+    def __init__(self, file, path):
+        self._location = f'{file}.upload'
+        st = os.stat(file)
+        self._key = {'path': path, 'size': st.st_size, 'mtime': st.st_mtime_ns}
+        self.offset = 0
+        self.partial = None
+        if os.path.exists(self._location):
+            try:
+                with open(self._location) as f:
+                    data = json.load(f)
+                if data['key'] == self._key:
+                    self.offset, self.partial = data['offset'], data['partial']
+            except (OSError, ValueError, KeyError, TypeError):
+                # a damaged checkpoint only costs the progress it recorded
+                self.offset, self.partial = 0, None
+
+    @property
+    def exists(self):
+        return self.offset > 0
+
+    def save(self):
+        tmp = f'{self._location}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'key': self._key, 'offset': self.offset, 'partial': self.partial}, f)
+        os.replace(tmp, self._location)
+
+    def remove(self):
+        if os.path.exists(self._location):
+            os.remove(self._location)
+
 
 class YaDiskWithProgress(YaDisk):
+    def __init__(self, login, password, url=None, chunk_size=16 * 1024 * 1024, retries=5):
+        super().__init__(login, password)
+        if url is not None:
+            self.url = url
+        self._chunk_size = chunk_size
+        self._retries = retries
+
+    def read(self, path):
+        resp = self._sendRequest("GET", path)
+        if resp.status_code != 200:
+            raise YaDiskException(resp.status_code, resp.content)
+        return resp.content
+
+    def ensure_dir(self, path):
+        try:
+            self.mkdir(path)
+        except YaDiskException as e:
+            if e.code != 405:
+                raise
+
+    def _get_remote_size(self, path):
+        resp = self._send_with_retry("HEAD", path)
+        if resp.status_code != 200:
+            return None
+        return int(resp.headers.get('Content-Length', -1))
+
+    def _send_with_retry(self, type, path, headers=None, data_factory=lambda: None):
+        attempt = 0
+        while True:
+            try:
+                resp = self._sendRequest(type, path, headers or {}, data_factory())
+                if resp.status_code < 500:
+                    return resp
+                error = YaDiskException(resp.status_code, resp.content)
+            except RequestException as e:
+                error = e
+            if attempt >= self._retries:
+                raise error
+            delay = min(60, 2 ** attempt) * uniform(0.5, 1.5)
+            attempt += 1
+            ui.show(f'Request failed: {error}\nRetry {attempt}/{self._retries} in {delay:.1f}s')
+            sleep(delay)
+
+    @staticmethod
+    def _partitioner(file, tracker, offset=0, length=None):
+        def factory():
+            tracker.set_progress(offset)
+            return ChunkPartitioner(file, '', offset=offset, length=length, tracker=tracker)
+
+        return factory
+
+    def _upload_partially(self, file, path, checkpoint: UploadCheckpoint, tracker, size):
+        while checkpoint.offset < size:
+            offset = checkpoint.offset
+            length = min(self._chunk_size, size - offset)
+            headers = {'Content-Range': f'bytes {offset}-{offset + length - 1}/{size}'}
+            resp = self._send_with_retry("PUT", path, headers, self._partitioner(file, tracker, offset, length))
+            if resp.status_code in PARTIAL_UPLOAD_REJECTED and offset == 0:
+                return False
+            if resp.status_code not in UPLOAD_SUCCEEDED:
+                raise YaDiskException(resp.status_code, resp.content)
+            checkpoint.offset = offset + length
+            if checkpoint.partial is None and offset > 0:
+                checkpoint.partial = self._get_remote_size(path) == checkpoint.offset
+                if not checkpoint.partial:
+                    return False
+            checkpoint.save()
+        return True
+
     def upload(self, file, path):
-        resp = self._sendRequest("PUT", path, data=ChunkPartitioner(file, 'Uploading library'))
-        if resp.status_code != 201:
+        size = os.path.getsize(file)
+        checkpoint = UploadCheckpoint(file, path)
+        if checkpoint.exists and self._get_remote_size(path) != checkpoint.offset:
+            checkpoint.offset = 0
+        tracker = ProgressTracker(max(1, size), 'Uploading library')
+        tracker.add_progress(checkpoint.offset)
+
+        if size <= self._chunk_size or checkpoint.partial is False \
+                or not self._upload_partially(file, path, checkpoint, tracker, size):
+            checkpoint.offset = 0
+            checkpoint.partial = False
+            checkpoint.save()
+            resp = self._send_with_retry("PUT", path, data_factory=self._partitioner(file, tracker))
+            if resp.status_code not in UPLOAD_SUCCEEDED:
+                raise YaDiskException(resp.status_code, resp.content)
+        tracker.close()
+        checkpoint.remove()
+
+    def has_unfinished_upload(self, file, path):
+        return os.path.exists(file) and UploadCheckpoint(file, path).exists
+
+    def upload_stream(self, stream, path):
+        resp = self._sendRequest("PUT", path, data=iter(stream))
+        if resp.status_code not in UPLOAD_SUCCEEDED:
             raise YaDiskException(resp.status_code, resp.content)
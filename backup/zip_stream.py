@@ -0,0 +1,78 @@
+import os
+import io
+import zipfile
+from collections import deque
+from utils import ProgressTracker
+
+__all__ = ['ZipStream']
+
+
+class _StreamBuffer(io.RawIOBase):
+    def __init__(self):
+        self._chunks = deque()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+class ZipStream:
+    stored_extensions = ('.flac', '.alac', '.mp3', '.m4a', '.ogg', '.opus', '.jpeg', '.jpg', '.png', '.zip')
+
+    def __init__(self, folder, msg, chunk_size=1024 * 1024, root_name='', tracker: ProgressTracker = None):
+        self._folder = folder
+        self._chunk_size = chunk_size
+        self._root_name = root_name
+        self._files = sorted(self._list_files(folder))
+        self._total_size = sum(os.path.getsize(f) for f in self._files)
+        self._own_tracker = tracker is None
+        self._tracker = ProgressTracker(max(1, self._total_size), msg) if tracker is None else tracker
+
+    @staticmethod
+    def _list_files(folder):
+        for dirpath, dirnames, filenames in os.walk(folder):
+            for f in filenames:
+                yield os.path.join(dirpath, f)
+
+    @property
+    def total_size(self):
+        return self._total_size
+
+    def _get_zip_info(self, path):
+        arcname = os.path.join(self._root_name, os.path.relpath(path, self._folder))
+        info = zipfile.ZipInfo.from_file(path, arcname)
+        if os.path.splitext(path)[1].lower() in self.stored_extensions:
+            info.compress_type = zipfile.ZIP_STORED
+        else:
+            info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    def __iter__(self):
+        buffer = _StreamBuffer()
+        with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+            for path in self._files:
+                with open(path, 'rb') as src, archive.open(self._get_zip_info(path), 'w') as dest:
+                    while True:
+                        data = src.read(self._chunk_size)
+                        if not data:
+                            break
+                        dest.write(data)
+                        self._tracker.add_progress(len(data))
+                        if buffer.size >= self._chunk_size:
+                            yield buffer.pop()
+                if buffer.size > 0:
+                    yield buffer.pop()
+        if self._own_tracker:
+            self._tracker.close()
+        yield buffer.pop()
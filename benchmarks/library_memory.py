@@ -0,0 +1,105 @@
+"""Compares memory and pickle size of the library representation with the plain __dict__ classes it replaced
+
+Usage: python -m benchmarks.library_memory [albums] [tracks per album]
+"""
+import sys
+import pickle
+import tracemalloc
+from io import BytesIO
+from time import perf_counter
+from collections import defaultdict
+from collections.abc import MutableMapping
+from music_management import Album, Track, CaseNonSensitiveDict
+
+
+class LegacyTrack:
+    def __init__(self, name, path, offset='00:00:00'):
+        self.name = name
+        self.path = path
+        self.offset = offset
+
+
+class LegacyAlbum:
+    def __init__(self, performer, year, name, tracks=None, cue_name=None, cover_name=None):
+        self.performer = performer
+        self.name = name
+        self.year = year
+        self.tracks = tracks
+        self.cue_name = cue_name
+        self.cover_name = cover_name
+
+
+class LegacyCaseNonSensitiveDict(MutableMapping):
+    def __init__(self, default_factory=None):
+        self._dict = defaultdict(default_factory)
+
+    def __delitem__(self, key):
+        del self._dict[key]
+
+    def __setitem__(self, key, value):
+        self._dict[key.lower()] = value
+
+    def __len__(self):
+        return len(self._dict)
+
+    def __getitem__(self, key):
+        return self._dict[key.lower()]
+
+    def __iter__(self):
+        return iter(self._dict)
+
+
+class LegacyUnpickler(pickle.Unpickler):
+    classes = {'LegacyTrack': Track, 'LegacyAlbum': Album, 'LegacyCaseNonSensitiveDict': CaseNonSensitiveDict}
+
+    def find_class(self, module, name):
+        return self.classes.get(name) or super().find_class(module, name)
+
+
+def build(album_cls, track_cls, dict_cls, albums, tracks):
+    # every row read from storage comes with its own string objects
+    library = dict_cls(list)
+    for i in range(albums):
+        performer = ''.join(('Performer ', str(i // 10)))
+        cue = i % 4 == 0
+        album_tracks = []
+        for j in range(tracks):
+            name = f'{j + 1:02d} - Track {j}'
+            path = f'Album {i}.flac' if cue else f'{name}.flac'
+            offset = f'{j * 4:02d}:00:00' if cue else ''.join(('00:00', ':00'))
+            album_tracks.append(track_cls(name, path, offset))
+        library[performer].append(album_cls(performer, 1970 + i % 50, f'Album {i}', album_tracks,
+                                            f'Album {i}.cue' if cue else None, ''.join(('cover', '.jpg'))))
+    return library
+
+
+def measure(album_cls, track_cls, dict_cls, albums, tracks):
+    tracemalloc.start()
+    start = perf_counter()
+    library = build(album_cls, track_cls, dict_cls, albums, tracks)
+    elapsed = perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    data = pickle.dumps({k: library[k] for k in library}, pickle.HIGHEST_PROTOCOL)
+    return library, memory, len(data), elapsed
+
+
+def main(albums=50000, tracks=12):
+    print(f'{albums} albums, {albums * tracks} tracks')
+    legacy, legacy_memory, legacy_pickle, legacy_time = measure(LegacyAlbum, LegacyTrack, LegacyCaseNonSensitiveDict,
+                                                                albums, tracks)
+    _, memory, pickle_size, elapsed = measure(Album, Track, CaseNonSensitiveDict, albums, tracks)
+    print(f'{"":10} {"memory, MB":>12} {"pickle, MB":>12} {"build, s":>10}')
+    print(f'{"legacy":10} {legacy_memory / 2 ** 20:12.1f} {legacy_pickle / 2 ** 20:12.1f} {legacy_time:10.2f}')
+    print(f'{"slotted":10} {memory / 2 ** 20:12.1f} {pickle_size / 2 ** 20:12.1f} {elapsed:10.2f}')
+    print(f'memory saved: {(1 - memory / legacy_memory) * 100:.0f}%')
+
+    # the whole mapping is pickled as library.metadata used to be
+    restored = LegacyUnpickler(BytesIO(pickle.dumps(legacy))).load()
+    album = restored['PERFORMER 0'][0]
+    print(f'legacy pickle loads as {type(restored).__name__} of {type(album).__name__}/{type(album.tracks[0]).__name__}'
+          f': {len(restored)} performers, {album.performer} - {album}, {album.tracks[0].path}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
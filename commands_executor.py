@@ -1,9 +1,13 @@
+import json
+from asyncio import gather
 from music_management import MusicLibrary
 from ui import ui
 from backup import Uploader
 from getpass import getpass
 from settings import settings
-from music_downloading import LastFM, download_album_to_lib_async
+from music_downloading import LastFM, get_resolution_cache, get_last_fm_cache, shutdown_last_fm_executor, \
+    run_last_fm_async, DownloadQueue, DownloadWorker
+from settings import get_queue_workers, get_download_bandwidth_limit, get_download_attempts
 
 
 class ArgsParser:
@@ -76,12 +80,36 @@ class CommandsExecutor:
         self._lib: MusicLibrary = library
         self._loop = loop
         self._running = False
+        self._queue = DownloadQueue(library.location, get_download_attempts())
+        self._worker = DownloadWorker(self._queue, library, get_queue_workers(), get_download_bandwidth_limit())
 
     def __enter__(self):
+        unfinished = self._queue.unfinished
+        if unfinished > 0:
+            ui.show(f'Resuming {unfinished} unfinished downloads')
+        self._worker.start()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self._worker.stop()
         self._loop.close()
+        shutdown_last_fm_executor()
+
+    def _download(self, *albums):
+        albums = [a for a in albums if not self._queue.is_queued(a.artist.name, a.title)]
+
+        async def get_years():
+            return await gather(*[run_last_fm_async(LastFM.get_release_year, a) for a in albums])
+
+        # the background worker can not ask for input, so the year is resolved here
+        years = self._loop.run_until_complete(get_years())
+        added = 0
+        for album, year in zip(albums, years):
+            if year is None:
+                year = ui.get_input_from_user(f'Enter {album.artist.name} - {album.title} release date', read_int=True)
+            added += self._queue.add(album.artist.name, album.title, year)
+        self._worker.notify()
+        ui.show(f'Added {added} albums to download queue' if added > 0 else 'Already in download queue')
 
     @command('ls')
     def show_library(self):
@@ -95,6 +123,16 @@ class CommandsExecutor:
     def extract_all_albums_from_folder(self, folder):
         self._lib.add_folder(folder)
 
+    @command('bi', 'Enter path to folder with music or to review file', ArgsParser(str))
+    def batch_import_albums(self, path):
+        self._lib.import_folder(path)
+
+    @command('st')
+    def show_library_stats(self):
+        missing = self._lib.show_stats()
+        if missing > 0 and ui.ask_ok(f'Read stream info of {missing} tracks from album files?'):
+            self._lib.update_track_info()
+
     @command('e', 'Enter path to music player folder', ArgsParser(str))
     def export_library_to_player(self, folder):
         self._lib.export(folder)
@@ -117,16 +155,61 @@ class CommandsExecutor:
         indexes.append('ex')
         options = [str(a) for a in recommended]
         options.append('abort operation')
+        indexes.insert(-1, 'all')
+        options.insert(-1, 'download all')
         i, _ = ui.choose('Top albums of the week not included in library\nDownload some?', options, indexes)
-        if i == len(recommended):
+        if i == len(recommended) + 1:
             return
-        self._loop.run_until_complete(download_album_to_lib_async(recommended[i], self._lib))
+        if i == len(recommended):
+            self._download(*recommended)
+        else:
+            self._download(recommended[i])
 
     @command('d', 'Enter performer and album title', ArgsParser(str, str))
     def download_album(self, performer, title):
         last_fm = LastFM()
         album = last_fm.search_album(performer, title)
-        self._loop.run_until_complete(download_album_to_lib_async(album, self._lib))
+        if album is None:
+            ui.show('Album not found')
+            return
+        self._download(album)
+
+    @command('q')
+    def show_download_queue(self):
+        counts = ', '.join(f'{count} {state}' for state, count in self._queue.counts().items())
+        jobs = '\n'.join(str(job) for job in self._queue.jobs[-30:])
+        i, _ = ui.choose(f'Download queue: {counts}\n{self._worker.format_stats()}\n'
+                         f'Http requests:\n{self._worker.format_http_stats()}\n{jobs}',
+                         ['show log', 'retry failed jobs', 'clear finished jobs', 'abort operation'],
+                         ['log', 'r', 'c', 'ex'])
+        if i == 0:
+            ui.show('\n'.join(self._worker.log.lines[-50:]) or 'Log is empty')
+        elif i == 1:
+            ui.show(f'Restarted {self._queue.retry_failed()} jobs')
+            self._worker.notify()
+        elif i == 2:
+            ui.show(f'Removed {self._queue.clear_finished()} jobs')
+
+    @command('yc')
+    def manage_youtube_search_cache(self):
+        cache = get_resolution_cache()
+        i, _ = ui.choose(f'Youtube search cache: {cache.stats()}',
+                         ['show recent entries', 'purge expired entries', 'purge all entries', 'abort operation'],
+                         ['ls', 'exp', 'all', 'ex'])
+        if i == 0:
+            for key, value, _ in cache.items(limit=30):
+                performer, title = key.split('\0')
+                ui.show(f'{performer} - {title}: {json.loads(value.decode())["video_id"] or "not found"}')
+        elif i in (1, 2):
+            ui.show(f'Removed {cache.purge(expired_only=i == 1)} entries')
+
+    @command('lc')
+    def manage_last_fm_cache(self):
+        cache = get_last_fm_cache()
+        i, _ = ui.choose(f'Last.fm cache: {cache.stats()}',
+                         ['purge expired entries', 'purge all entries', 'abort operation'], ['exp', 'all', 'ex'])
+        if i in (0, 1):
+            ui.show(f'Removed {cache.purge(expired_only=i == 0)} entries')
 
     @command('ex')
     def save_library_and_exit(self):
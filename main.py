@@ -13,6 +13,7 @@ from ui import set_ui, ConsoleUI, ui
 def parse_args():
     parser = argparse.ArgumentParser('Music manager')
     parser.add_argument('-l', '--library', help='path to library')
+    parser.add_argument('--full-scan', action='store_true', help='ignore directory index and rescan whole library')
     return parser.parse_args()
 
 
@@ -36,7 +37,7 @@ def main():
         ui.show('Not found library, specify it in settings.json or pass through arguments')
         sys.exit(1)
 
-    with MusicLibrary(lib_location) as ml:
+    with MusicLibrary(lib_location, incremental_scan=not args.full_scan) as ml:
         ui.show(f'Library loaded [{lib_location}]')
         ml.show_library()
         with CommandsExecutor(ml, loop) as executor:
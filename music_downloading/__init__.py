@@ -2,5 +2,15 @@ from .last_fm import *
 from .music_converter import *
 from .music_downloader import *
 from .youtube_resolver import *
+from .http_client import *
+from .pipeline import *
+from .disk_cache import *
+from .last_fm_cache import *
+from .stream_extractor import *
+from .segmented_download import *
+from .download_queue import *
+from .download_worker import *
 
-__all__ = last_fm.__all__ + music_converter.__all__ + music_downloader.__all__ + youtube_resolver.__all__
+__all__ = last_fm.__all__ + music_converter.__all__ + music_downloader.__all__ + youtube_resolver.__all__ + \
+          http_client.__all__ + pipeline.__all__ + disk_cache.__all__ + last_fm_cache.__all__ + \
+          stream_extractor.__all__ + segmented_download.__all__ + download_queue.__all__ + download_worker.__all__
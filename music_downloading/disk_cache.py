@@ -0,0 +1,115 @@
+import json
+import sqlite3
+from time import time
+from pathlib import Path
+from threading import Lock
+from typing import NamedTuple, Optional
+
+__all__ = ['DiskCache', 'CacheEntry']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    meta TEXT,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+'''
+
+
+class CacheEntry(NamedTuple):
+    value: bytes
+    meta: Optional[dict]
+    expires_at: float
+
+    @property
+    def expired(self):
+        return self.expires_at <= time()
+
+
+class DiskCache:
+    def __init__(self, location: Path, max_entries=None, max_bytes=None):
+        self._location = location
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = Lock()
+        self._connection = sqlite3.connect(str(location), check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, key) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._connection.execute('SELECT value, meta, expires_at FROM entries WHERE key = ?',
+                                           (key,)).fetchone()
+            if row is None:
+                return None
+            with self._connection:
+                self._connection.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (time(), key))
+        value, meta, expires_at = row
+        return CacheEntry(value, None if meta is None else json.loads(meta), expires_at)
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        if entry is None or entry.expired:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.value
+
+    def set(self, key, value: bytes, ttl, meta: dict = None):
+        now = time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (key, value, meta, size, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, value, None if meta is None else json.dumps(meta), len(value), now + ttl, now))
+            self._evict()
+
+    def touch(self, key, ttl):
+        with self._lock, self._connection:
+            self._connection.execute('UPDATE entries SET expires_at = ?, accessed_at = ? WHERE key = ?',
+                                     (time() + ttl, time(), key))
+
+    def _evict(self):
+        if self._max_entries is not None:
+            self._connection.execute(
+                'DELETE FROM entries WHERE key IN '
+                '(SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)', (self._max_entries,))
+        if self._max_bytes is not None:
+            total, = self._connection.execute('SELECT TOTAL(size) FROM entries').fetchone()
+            if total <= self._max_bytes:
+                return
+            total = 0
+            for key, size in self._connection.execute(
+                    'SELECT key, size FROM entries ORDER BY accessed_at DESC').fetchall():
+                total += size
+                if total > self._max_bytes:
+                    self._connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def items(self, limit=None):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT key, value, expires_at FROM entries ORDER BY accessed_at DESC LIMIT ?',
+                (-1 if limit is None else limit,)).fetchall()
+
+    def stats(self):
+        with self._lock:
+            count, size = self._connection.execute('SELECT COUNT(*), TOTAL(size) FROM entries').fetchone()
+            expired, = self._connection.execute('SELECT COUNT(*) FROM entries WHERE expires_at <= ?',
+                                                (time(),)).fetchone()
+        return (f'{count} entries ({expired} expired), {size / 1024:.1f} KB, '
+                f'{self.hits} hits and {self.misses} misses in this session')
+
+    def purge(self, expired_only=False):
+        with self._lock, self._connection:
+            if expired_only:
+                return self._connection.execute('DELETE FROM entries WHERE expires_at <= ?', (time(),)).rowcount
+            return self._connection.execute('DELETE FROM entries').rowcount
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,156 @@
+import os
+import json
+from time import time
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional
+
+__all__ = ['DownloadJob', 'DownloadQueue']
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+RETRY_DELAY = 30
+
+
+class DownloadJob:
+    def __init__(self, performer, title, state=PENDING, attempts=0, error=None, added_at=None, started_at=None,
+                 finished_at=None, retry_at=None, year=None):
+        self.performer = performer
+        self.title = title
+        self.year = year
+        self.state = state
+        self.attempts = attempts
+        self.error = error
+        self.added_at = time() if added_at is None else added_at
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.retry_at = retry_at
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0
+        return (self.finished_at or time()) - self.started_at
+
+    def is_same(self, performer, title):
+        return self.performer.lower() == performer.lower() and self.title.lower() == title.lower()
+
+    def __str__(self):
+        result = f'[{self.state}] {self.performer} - {self.title}'
+        if self.attempts > 1:
+            result += f' (attempt {self.attempts})'
+        if self.state in (RUNNING, DONE) and self.started_at is not None:
+            result += f' {self.elapsed:.0f}s'
+        if self.error is not None:
+            result += f': {self.error}'
+        return result
+
+
+class DownloadQueue:
+    file_name = 'library.queue'
+
+    def __init__(self, root: Path, max_attempts=3):
+        self._location = root.joinpath(self.file_name)
+        self._max_attempts = max_attempts
+        self._lock = Lock()
+        self._jobs: List[DownloadJob] = []
+        if self._location.exists():
+            with self._location.open() as f:
+                self._jobs = [DownloadJob(**job) for job in json.load(f)['jobs']]
+        for job in self._jobs:
+            if job.state == RUNNING:
+                job.state = PENDING
+
+    def _save(self):
+        tmp = self._location.with_suffix('.tmp')
+        with tmp.open('w') as f:
+            json.dump({'version': 1, 'jobs': [vars(job) for job in self._jobs]}, f, indent=2)
+        os.replace(str(tmp), str(self._location))
+
+    @property
+    def jobs(self) -> List[DownloadJob]:
+        with self._lock:
+            return list(self._jobs)
+
+    @property
+    def unfinished(self):
+        with self._lock:
+            return sum(1 for job in self._jobs if job.state in (PENDING, RUNNING))
+
+    def counts(self):
+        with self._lock:
+            result = {state: 0 for state in (PENDING, RUNNING, DONE, FAILED)}
+            for job in self._jobs:
+                result[job.state] += 1
+            return result
+
+    def is_queued(self, performer, title):
+        with self._lock:
+            return any(job.is_same(performer, title) and job.state in (PENDING, RUNNING) for job in self._jobs)
+
+    def add(self, performer, title, year=None):
+        with self._lock:
+            if any(job.is_same(performer, title) and job.state in (PENDING, RUNNING) for job in self._jobs):
+                return False
+            self._jobs.append(DownloadJob(performer, title, year=year))
+            self._save()
+            return True
+
+    def next_retry_in(self):
+        with self._lock:
+            delays = [job.retry_at - time() for job in self._jobs if job.state == PENDING and job.retry_at is not None]
+            return max(0, min(delays)) if len(delays) > 0 else None
+
+    def take(self) -> Optional[DownloadJob]:
+        with self._lock:
+            now = time()
+            job = next((job for job in self._jobs
+                        if job.state == PENDING and (job.retry_at is None or job.retry_at <= now)), None)
+            if job is None:
+                return None
+            job.state = RUNNING
+            job.attempts += 1
+            job.error = None
+            job.started_at = now
+            job.finished_at = None
+            job.retry_at = None
+            self._save()
+            return job
+
+    def finish(self, job: DownloadJob, error=None):
+        with self._lock:
+            job.finished_at = time()
+            job.error = None if error is None else str(error)
+            if error is None:
+                job.state = DONE
+            elif job.attempts >= self._max_attempts:
+                job.state = FAILED
+            else:
+                job.state = PENDING
+                job.retry_at = job.finished_at + RETRY_DELAY * job.attempts
+            self._save()
+
+    def release(self, job: DownloadJob):
+        with self._lock:
+            job.state = PENDING
+            job.attempts -= 1
+            self._save()
+
+    def retry_failed(self):
+        with self._lock:
+            failed = [job for job in self._jobs if job.state == FAILED]
+            for job in failed:
+                job.state = PENDING
+                job.attempts = 0
+                job.retry_at = None
+            self._save()
+            return len(failed)
+
+    def clear_finished(self):
+        with self._lock:
+            count = len(self._jobs)
+            self._jobs = [job for job in self._jobs if job.state in (PENDING, RUNNING)]
+            self._save()
+            return count - len(self._jobs)
@@ -0,0 +1,138 @@
+import sys
+import asyncio
+from threading import Thread
+from time import perf_counter
+from ui import ui, BackgroundUI
+from settings import get_http_connections_limit, get_http_connections_per_host, get_convert_workers, \
+    get_extract_workers
+from .download_queue import DownloadQueue, DownloadJob
+from .http_client import HttpClient, BandwidthLimiter
+from .pipeline import ConversionScheduler
+from .stream_extractor import StreamExtractor
+from .last_fm import LastFM, run_last_fm_async
+from .music_downloader import download_album_to_lib_async
+
+__all__ = ['DownloadWorker']
+
+
+class DownloadWorker:
+    """Downloads queued albums on a background thread with its own event loop"""
+
+    def __init__(self, queue: DownloadQueue, library, workers=2, bandwidth=0):
+        self._queue = queue
+        self._library = library
+        self._workers = workers
+        self._bandwidth = bandwidth
+        self._loop = None
+        self._thread = None
+        self._task = None
+        self._wakeup = None
+        self._http = None
+        self._running_jobs = 0
+        self._busy_since = None
+        self._busy_time = 0
+        self.log = BackgroundUI()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.ProactorEventLoop() if sys.platform == 'win32' else asyncio.new_event_loop()
+        if sys.platform != 'win32' and sys.version_info < (3, 8):
+            # subprocesses are reaped through SIGCHLD, which is delivered to the loop attached to the watcher
+            asyncio.get_child_watcher().attach_loop(self._loop)
+        self._thread = Thread(target=self._run, name='downloads', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(lambda: self._task is not None and self._task.cancel())
+        self._thread.join()
+        self._thread = None
+
+    def notify(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(lambda: self._wakeup is not None and self._wakeup.set())
+
+    @property
+    def received(self):
+        return 0 if self._http is None else self._http.received
+
+    @property
+    def busy_time(self):
+        if self._busy_since is None:
+            return self._busy_time
+        return self._busy_time + perf_counter() - self._busy_since
+
+    def format_stats(self):
+        busy = self.busy_time
+        speed = f', {self.received / busy / 1024 / 1024:.2f} MB/s' if busy > 0 else ''
+        return f'{self._running_jobs} running, downloaded {self.received / 1024 / 1024:.1f} MB in {busy:.0f}s{speed}'
+
+    def format_http_stats(self):
+        return 'No http requests' if self._http is None else self._http.format_stats()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        ui.set_thread_ui(self.log)
+        self._task = self._loop.create_task(self._main())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _main(self):
+        self._wakeup = asyncio.Event()
+        self._http = HttpClient(get_http_connections_limit(), get_http_connections_per_host(),
+                                bandwidth=BandwidthLimiter(self._bandwidth))
+        converter = ConversionScheduler(get_convert_workers())
+        extractor = StreamExtractor(get_extract_workers())
+        try:
+            await asyncio.gather(*[self._work(converter, extractor) for _ in range(self._workers)])
+        finally:
+            await self._http.close()
+            extractor.shutdown()
+
+    async def _wait_for_jobs(self):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self._queue.next_retry_in())
+        except asyncio.TimeoutError:
+            pass
+
+    def _set_running(self, delta):
+        if self._running_jobs == 0:
+            self._busy_since = perf_counter()
+        self._running_jobs += delta
+        if self._running_jobs == 0:
+            self._busy_time += perf_counter() - self._busy_since
+            self._busy_since = None
+
+    async def _work(self, converter, extractor):
+        while True:
+            job = self._queue.take()
+            if job is None:
+                await self._wait_for_jobs()
+                continue
+            self._set_running(1)
+            try:
+                await self._download(job, converter, extractor)
+            finally:
+                self._set_running(-1)
+
+    async def _download(self, job: DownloadJob, converter, extractor):
+        ui.show(f'Downloading {job.performer} - {job.title}')
+        try:
+            album = await run_last_fm_async(LastFM().get_album, job.performer, job.title)
+            await download_album_to_lib_async(album, self._library, self._http, converter, extractor, resume=True,
+                                              year=job.year)
+        except asyncio.CancelledError:
+            self._queue.release(job)
+            raise
+        except Exception as e:
+            ui.show(f'Failed to download {job.performer} - {job.title}: {e}')
+            self._queue.finish(job, e)
+        else:
+            self._queue.finish(job)
@@ -0,0 +1,111 @@
+from time import perf_counter, monotonic
+from asyncio import sleep
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import aiohttp
+
+__all__ = ['HttpClient', 'BandwidthLimiter']
+
+
+class BandwidthLimiter:
+    def __init__(self, rate):
+        self.rate = rate
+        self._available_at = monotonic()
+
+    async def consume(self, size):
+        if self.rate <= 0:
+            return
+        now = monotonic()
+        self._available_at = max(self._available_at, now) + size / self.rate
+        if self._available_at - now > 1:
+            await sleep(self._available_at - now - 1)
+
+
+class _RequestStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0
+        self.max_time = 0
+        self.errors = 0
+
+    def add(self, elapsed, failed):
+        self.count += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if failed:
+            self.errors += 1
+
+    def __str__(self):
+        avg = self.total_time / self.count if self.count > 0 else 0
+        return f'{self.count} requests, avg {avg:.2f}s, max {self.max_time:.2f}s, errors {self.errors}'
+
+
+class _TimedRequest:
+    def __init__(self, client, method, url, kwargs):
+        self._client = client
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._resp = None
+        self._start = None
+
+    async def __aenter__(self):
+        self._start = perf_counter()
+        session = self._client.get_session()
+        try:
+            self._resp = await session.request(self._method, self._url, **self._kwargs)
+        except Exception:
+            self._client.record(self._url, perf_counter() - self._start, True)
+            raise
+        return self._resp
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._resp.release()
+        failed = exc_type is not None or self._resp.status >= 400
+        self._client.record(self._url, perf_counter() - self._start, failed)
+
+
+class HttpClient:
+    def __init__(self, limit=64, limit_per_host=8, dns_cache_ttl=300, keepalive_timeout=60,
+                 bandwidth: BandwidthLimiter = None):
+        self._connector_args = dict(limit=limit, limit_per_host=limit_per_host,
+                                    ttl_dns_cache=dns_cache_ttl, keepalive_timeout=keepalive_timeout)
+        self._session = None
+        self._stats = OrderedDict()
+        self._bandwidth = bandwidth
+        self.received = 0
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(**self._connector_args))
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        return _TimedRequest(self, method, url, kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    async def throttle(self, size):
+        self.received += size
+        if self._bandwidth is not None:
+            await self._bandwidth.consume(size)
+
+    def record(self, url, elapsed, failed):
+        host = urlsplit(url).hostname
+        if host not in self._stats:
+            self._stats[host] = _RequestStats()
+        self._stats[host].add(elapsed, failed)
+
+    def format_stats(self):
+        if len(self._stats) == 0:
+            return 'No http requests'
+        return '\n'.join(f'{host}: {stats}' for host, stats in self._stats.items())
+
+    def reset_stats(self):
+        self._stats.clear()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -1,16 +1,42 @@
-from typing import List
+from typing import List, Optional
+from asyncio import get_event_loop
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 from pylast import LastFMNetwork, WSError, Album
-from urllib.request import urlopen
-from settings import get_last_fm_api_key
+from settings import get_last_fm_api_key, get_last_fm_workers
+from .http_client import HttpClient
+from .last_fm_cache import get_last_fm_cache, get_last_fm_cache_backend, fetch_cover, get_cover_key, \
+    get_revalidation_headers, store_cover, COVER_TTL
 
-__all__ = ['LastFM']
+__all__ = ['LastFM', 'run_last_fm_async', 'shutdown_last_fm_executor']
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(get_last_fm_workers())
+    return _executor
+
+
+async def run_last_fm_async(func, *args, **kwargs):
+    return await get_event_loop().run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_last_fm_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
 
 
 class LastFM:
     def __init__(self, username=''):
         self._username = username
         self._api = LastFMNetwork(api_key=get_last_fm_api_key())
+        self._api.cache_backend = get_last_fm_cache_backend()
         self._user = self._api.get_user(self._username)
 
     def try_download_cover(self, performer, title, path):
@@ -19,21 +45,82 @@ class LastFM:
             cover = title.get_cover_image()
         except WSError:
             return False
-        cover_data = urlopen(cover).read()
+        cover_data = fetch_cover(cover)
         with open(path.joinpath('cover.png'), 'wb') as f:
             f.write(cover_data)
         return True
 
+    async def get_cover_async(self, performer, title, client: HttpClient) -> Optional[bytes]:
+        album = self._api.get_album(performer, title)
+        try:
+            cover = await run_last_fm_async(album.get_cover_image)
+        except WSError:
+            return None
+        if not cover:
+            return None
+        cache = get_last_fm_cache()
+        entry = cache.get_entry(get_cover_key(cover))
+        if entry is not None and not entry.expired:
+            return entry.value
+        async with client.get(cover, headers=get_revalidation_headers(entry)) as resp:
+            if resp.status == 304 and entry is not None:
+                cache.touch(get_cover_key(cover), COVER_TTL)
+                return entry.value
+            resp.raise_for_status()
+            data = await resp.read()
+        store_cover(cover, data, resp.headers)
+        return data
+
+    def get_album(self, performer, title) -> Album:
+        return self._api.get_album(performer, title)
+
+    @staticmethod
+    def get_release_year(album: Album) -> Optional[int]:
+        try:
+            date = album.get_wiki_published_date()
+        except WSError:
+            return None
+        year = None if date is None else date[-11:-7]
+        return int(year) if year is not None and year.isdigit() else None
+
     def get_weekly_top_albums(self):
         return self._user.get_weekly_album_charts()
 
-    def search_album(self, performer, title):
-        suitable = []
-        for album in self._api.search_for_album(title).get_next_page():
-            if album.artist.name.lower() == performer.lower():
-                suitable.append(album)
-        if len(suitable) > 0:
-            return max(*suitable, key=lambda a: len(a.get_tracks()))
+    @staticmethod
+    def _title_rank(album, title):
+        name = album.get_name().lower()
+        if name == title.lower():
+            return 0
+        if title.lower() in name:
+            return 1
+        return 2
+
+    @staticmethod
+    def _count_tracks(album):
+        try:
+            return len(album.get_tracks())
+        except WSError:
+            return -1
+
+    def _choose_album(self, candidates, title):
+        ranks = [self._title_rank(a, title) for a in candidates]
+        max_rank = max(min(ranks), 1)
+        candidates = [(a, r) for a, r in zip(candidates, ranks) if r <= max_rank]
+        if len(candidates) == 1:
+            return candidates[0][0]
+        counts = _get_executor().map(self._count_tracks, [a for a, _ in candidates])
+        return max(zip(candidates, counts, range(0, -len(candidates), -1)),
+                   key=lambda c: (c[1], -c[0][1], c[2]))[0][0]
+
+    def search_album(self, performer, title, max_pages=3):
+        search = self._api.search_for_album(title)
+        for _ in range(max_pages):
+            page = search.get_next_page()
+            suitable = [album for album in page if album.artist.name.lower() == performer.lower()]
+            if len(suitable) > 0:
+                return self._choose_album(suitable, title)
+            if len(page) == 0:
+                return None
 
     def get_recommended_albums(self, library, max=20) -> List[Album]:
         result = []
@@ -0,0 +1,123 @@
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from settings import get_cache_dir, get_last_fm_cache_size
+from .disk_cache import DiskCache, CacheEntry
+
+__all__ = ['get_last_fm_cache', 'get_last_fm_cache_backend', 'LastFMCacheBackend', 'fetch_cover',
+           'get_cover_key', 'get_revalidation_headers', 'store_cover']
+
+DAY = 24 * 60 * 60
+DEFAULT_TTL = DAY
+COVER_TTL = 30 * DAY
+RESPONSE_TTLS = {
+    'album': 30 * DAY,
+    'artist': 30 * DAY,
+    'track': 30 * DAY,
+    'tracks': 30 * DAY,
+    'results': DAY,
+}
+
+_root_tag = re.compile(r'<lfm[^>]*>\s*<(\w+)')
+_cache = None
+_backend = None
+
+
+def get_last_fm_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(get_cache_dir().joinpath('last_fm.sqlite'), max_bytes=get_last_fm_cache_size())
+    return _cache
+
+
+def get_last_fm_cache_backend():
+    global _backend
+    if _backend is None:
+        _backend = LastFMCacheBackend(get_last_fm_cache())
+    return _backend
+
+
+def _until_next_chart():
+    now = datetime.now(timezone.utc)
+    boundary = (now + timedelta(days=(6 - now.weekday()) % 7)).replace(hour=12, minute=0, second=0, microsecond=0)
+    if boundary <= now:
+        boundary += timedelta(days=7)
+    return max(60 * 60, (boundary - now).total_seconds())
+
+
+def get_response_ttl(xml):
+    match = _root_tag.search(xml)
+    tag = match.group(1).lower() if match is not None else None
+    if tag is not None and tag.startswith('weekly'):
+        return _until_next_chart()
+    return RESPONSE_TTLS.get(tag, DEFAULT_TTL)
+
+
+class LastFMCacheBackend:
+    """pylast cache backend (see LastFMNetwork.cache_backend) on top of DiskCache"""
+
+    def __init__(self, cache: DiskCache):
+        self._cache = cache
+        self._local = threading.local()
+
+    @staticmethod
+    def _key(key):
+        return f'ws:{key}'
+
+    def __contains__(self, key):
+        value = self._cache.get(self._key(key))
+        self._local.pending = (key, value)
+        return value is not None
+
+    def __iter__(self):
+        return iter(key[3:] for key, _, _ in self._cache.items() if key.startswith('ws:'))
+
+    def get_xml(self, key):
+        pending_key, value = getattr(self._local, 'pending', (None, None))
+        self._local.pending = (None, None)
+        if pending_key != key or value is None:
+            value = self._cache.get_entry(self._key(key)).value
+        return value.decode()
+
+    def set_xml(self, key, xml):
+        self._cache.set(self._key(key), xml.encode(), get_response_ttl(xml))
+
+
+def get_cover_key(url):
+    return f'cover:{url}'
+
+
+def get_revalidation_headers(entry: Optional[CacheEntry]):
+    headers = {}
+    if entry is None or entry.meta is None:
+        return headers
+    if entry.meta.get('etag'):
+        headers['If-None-Match'] = entry.meta['etag']
+    if entry.meta.get('last_modified'):
+        headers['If-Modified-Since'] = entry.meta['last_modified']
+    return headers
+
+
+def store_cover(url, data, headers):
+    meta = {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+    get_last_fm_cache().set(get_cover_key(url), data, COVER_TTL, meta)
+
+
+def fetch_cover(url):
+    cache = get_last_fm_cache()
+    entry = cache.get_entry(get_cover_key(url))
+    if entry is not None and not entry.expired:
+        return entry.value
+    try:
+        with urlopen(Request(url, headers=get_revalidation_headers(entry))) as resp:
+            data = resp.read()
+            store_cover(url, data, resp.headers)
+            return data
+    except HTTPError as e:
+        if e.code == 304 and entry is not None:
+            cache.touch(get_cover_key(url), COVER_TTL)
+            return entry.value
+        raise
@@ -1,8 +1,23 @@
+import os
 from os import devnull
+from contextlib import contextmanager
 from pathlib import Path
 from ffmpy3 import FFmpeg
 
-__all__ = ['convert_to_audio_async']
+__all__ = ['convert_to_audio_async', 'convert_stream_to_audio_async']
+
+
+@contextmanager
+def _atomic_output(dest: Path):
+    # ffmpeg writes to a temporary name, so an interrupted conversion never looks like a finished track
+    tmp = dest.with_name(f'{dest.name}.tmp')
+    try:
+        yield tmp
+    except BaseException:
+        if tmp.exists():
+            os.remove(str(tmp))
+        raise
+    os.replace(str(tmp), str(dest))
 
 
 async def convert_to_audio_async(src: Path, dest_folder: Path, audio_format='mp3'):
@@ -14,11 +29,45 @@ async def convert_to_audio_async(src: Path, dest_folder: Path, audio_format='mp3
     dest = dest_folder.joinpath(f'{src.stem}.{audio_format}').absolute()
     src = src.absolute()
 
-    ff = FFmpeg(
-        inputs={str(src): '-y'},
-        outputs={str(dest): f'-f {audio_format}'}
-    )
+    with _atomic_output(dest) as tmp:
+        ff = FFmpeg(
+            inputs={str(src): '-y'},
+            outputs={str(tmp): f'-f {audio_format}'}
+        )
+
+        with open(devnull, 'w') as nul:
+            await ff.run_async(stdout=nul, stderr=nul)
+            await ff.wait()
+
+
+async def convert_stream_to_audio_async(chunks, dest: Path, audio_format='mp3'):
+    if not dest.parent.exists():
+        raise FileNotFoundError('Not found output dir')
+
+    with _atomic_output(dest.absolute()) as tmp:
+        ff = FFmpeg(
+            inputs={'pipe:0': '-y'},
+            outputs={str(tmp): f'-f {audio_format}'}
+        )
 
-    with open(devnull, 'w') as nul:
-        await ff.run_async(stdout=nul, stderr=nul)
-        await ff.wait()
+        with open(devnull, 'w') as nul:
+            process = None
+            try:
+                async for chunk in chunks:
+                    if process is None:
+                        process = await ff.run_async(input_data=chunk, stdout=nul, stderr=nul)
+                    else:
+                        process.stdin.write(chunk)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            except BaseException:
+                # the stream failed or was cancelled, ffmpeg must not keep writing the output
+                if process is not None and process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+            if process is None:
+                raise ValueError(f'Empty audio stream for {dest.name}')
+            process.stdin.close()
+            await ff.wait()
@@ -1,65 +1,180 @@
-from asyncio import gather
+from asyncio import gather, Queue, QueueEmpty, ensure_future, get_event_loop
 from pathlib import Path
-import aiohttp
 from os import remove
-from pytube import YouTube, Stream
+from pytube import Stream
 from pylast import Album
 
 from utils import ProgressTracker
-from .last_fm import LastFM
-from .music_converter import convert_to_audio_async
-from .youtube_resolver import resolve_track_async
-from ui import ui
+from .last_fm import LastFM, run_last_fm_async
+from .pipeline import StageMetrics, ConversionScheduler
+from .youtube_resolver import resolve_tracks_async
+from .stream_extractor import StreamExtractor
+from .http_client import HttpClient
+from .segmented_download import download_file_async
+from ui import ui, set_thread_ui
+from settings import get_download_workers, get_convert_workers, get_stream_conversion, get_extract_workers, \
+    get_download_chunk_size, get_download_segments
 
 __all__ = ['download_album_async', 'download_album_to_lib_async']
 
-
-def get_audio_download_stream(url):
-    if url is None:
-        return
-    return YouTube(url).streams.filter(only_audio=True).first()
+streamable_subtypes = ('webm',)
 
 
-async def download_audio_async(stream: Stream, dest, chunk_size=4 * 1024, on_chunk_read=lambda s: None):
+async def download_audio_async(stream: Stream, dest, client: HttpClient, chunk_size=None, segments=None,
+                               on_chunk_read=lambda s: None):
     if stream is None:
         return
     if not Path(dest).parent.exists():
         raise FileNotFoundError('Not found output dir')
+    if chunk_size is None:
+        chunk_size = get_download_chunk_size()
 
     url = stream.url
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
+    if stream.filesize:
+        await download_file_async(url, dest, stream.filesize, client, chunk_size,
+                                  get_download_segments() if segments is None else segments,
+                                  on_chunk_read=on_chunk_read)
+        return
+    async with client.get(url) as resp:
+        with open(dest, 'wb') as fd:
+            while True:
+                chunk = await resp.content.read(chunk_size)
+                if not chunk:
+                    break
+                fd.write(chunk)
+                on_chunk_read(len(chunk))
+                await client.throttle(len(chunk))
+
+
+async def stream_audio_async(stream: Stream, client: HttpClient, chunk_size=64 * 1024, on_chunk_read=lambda s: None):
+    async with client.get(stream.url) as resp:
+        while True:
+            chunk = await resp.content.read(chunk_size)
+            if not chunk:
+                break
+            on_chunk_read(len(chunk))
+            await client.throttle(len(chunk))
+            yield chunk
+
+
+def is_streamable(stream: Stream):
+    return get_stream_conversion() and stream.subtype in streamable_subtypes
+
 
-            with open(dest, 'wb') as fd:
-                while True:
-                    chunk = await resp.content.read(chunk_size)
-                    if not chunk:
-                        break
-                    fd.write(chunk)
-                    on_chunk_read(chunk_size)
+async def _download_and_convert_async(jobs, dest, client: HttpClient, converter: ConversionScheduler, tracker):
+    download_queue = Queue()
+    for job in jobs:
+        download_queue.put_nowait(job)
+    convert_queue = Queue(maxsize=converter.workers)
+    download_metrics = StageMetrics('download')
+    convert_metrics = StageMetrics('convert')
+    stream_metrics = StageMetrics('stream convert')
+    download_metrics.observe_queue(download_queue.qsize())
+    failed = []
 
+    async def download_worker():
+        while True:
+            try:
+                stream, raw = download_queue.get_nowait()
+            except QueueEmpty:
+                return
+            if is_streamable(stream):
+                output = dest.joinpath(f'{raw.stem}.mp3')
+                try:
+                    with stream_metrics.measure(stream.filesize):
+                        await converter.convert_stream(
+                            stream_audio_async(stream, client, on_chunk_read=tracker.add_progress), output)
+                except Exception as e:
+                    ui.show(f'Failed to download {raw.name}: {e}')
+                    failed.append(raw.stem)
+                continue
+            try:
+                with download_metrics.measure(stream.filesize):
+                    await download_audio_async(stream, raw, client, on_chunk_read=tracker.add_progress)
+            except Exception as e:
+                # the file and its .part checkpoint are kept, so the next attempt continues from them
+                ui.show(f'Failed to download {raw.name}: {e}')
+                failed.append(raw.stem)
+                continue
+            await convert_queue.put(raw)
+            convert_metrics.observe_queue(convert_queue.qsize())
 
-async def download_album_async(album: Album, dest_folder):
+    async def convert_worker():
+        while True:
+            raw = await convert_queue.get()
+            if raw is None:
+                return
+            try:
+                with convert_metrics.measure(raw.stat().st_size):
+                    await converter.convert(raw, dest)
+            except Exception as e:
+                ui.show(f'Failed to convert {raw.name}: {e}')
+                failed.append(raw.stem)
+            else:
+                remove(raw)
+
+    converters = [ensure_future(convert_worker()) for _ in range(converter.workers)]
+    try:
+        await gather(*[download_worker() for _ in range(min(get_download_workers(), len(jobs)))])
+        for _ in converters:
+            await convert_queue.put(None)
+        await gather(*converters)
+    finally:
+        for task in converters:
+            task.cancel()
+    metrics = [m for m in (download_metrics, convert_metrics, stream_metrics) if m.items + m.errors > 0]
+    if len(failed) > 0:
+        ui.show('\n'.join(str(m) for m in metrics))
+        # an incomplete album is not added to the library, a retry continues from the files kept on disk
+        raise RuntimeError(f'{len(failed)} of {len(jobs)} tracks failed: {", ".join(sorted(failed))}')
+    return metrics
+
+
+async def download_album_async(album: Album, dest_folder, client: HttpClient = None,
+                               converter: ConversionScheduler = None, extractor: StreamExtractor = None,
+                               resume=False, year=None):
+    if client is None:
+        client = HttpClient()
+        try:
+            return await download_album_async(album, dest_folder, client, converter, extractor, resume, year)
+        finally:
+            await client.close()
+    if extractor is None:
+        extractor = StreamExtractor(get_extract_workers())
+        try:
+            return await download_album_async(album, dest_folder, client, converter, extractor, resume, year)
+        finally:
+            extractor.shutdown()
+    if converter is None:
+        converter = ConversionScheduler(get_convert_workers())
     if not dest_folder.exists():
         raise FileNotFoundError(dest_folder)
-    ui.show('Searching album description')
-    tracks = album.get_tracks()
-    year = album.get_wiki_published_date()
-    if year is not None:
-        year = year[-11:-7]
-    else:
-        year = ui.get_input_from_user('Enter album release date', read_int=True)
     performer = album.artist
     title = album.title
+    extract_metrics = StageMetrics('extract')
+    ui.show('Searching album description and tracks')
+    lookups = [ensure_future(LastFM().get_cover_async(performer, title, client))]
+    if year is None:
+        lookups.append(ensure_future(run_last_fm_async(LastFM.get_release_year, album)))
+    try:
+        tracks = await run_last_fm_async(album.get_tracks)
+        streams = await resolve_tracks_async(tracks, client, lambda url: extractor.extract_async(url, extract_metrics))
+        cover, *found_year = await gather(*lookups)
+    finally:
+        for future in lookups:
+            future.cancel()
+    if all(s is None for s in streams):
+        raise LookupError(f'No tracks of {performer} - {title} found on youtube')
+    if year is None:
+        year = found_year[0]
+    if year is None:
+        year = ui.get_input_from_user('Enter album release date', read_int=True)
     dest = dest_folder.joinpath(f'{year} - {title}')
-    dest.mkdir()
-    ui.show('Downloading cover')
-    LastFM().try_download_cover(performer, title, dest)
-
-    ui.show('Searching tracks')
-    video_urls = await gather(*[resolve_track_async(track.artist, track.title) for track in tracks])
-    ui.show('Extracting sources')
-    streams = [get_audio_download_stream(url) for url in video_urls]
+    dest.mkdir(exist_ok=resume)
+    if cover is not None:
+        with open(dest.joinpath('cover.png'), 'wb') as f:
+            f.write(cover)
+
     total_size = sum(s.filesize for s in streams if s is not None)
     tracker = ProgressTracker(total_size, 'Downloading album')
     destinations = []
@@ -70,19 +185,33 @@ async def download_album_async(album: Album, dest_folder):
             ui.show(f'Not found {str(tracks[i])}')
             destinations.append(None)
 
-    await gather(*[download_audio_async(stream, raw, on_chunk_read=tracker.add_progress)
-                   for stream, raw in zip(streams, destinations)])
-    tracker.close()
-    ui.show('Converting to mp3')
-    await gather(*[convert_to_audio_async(d, dest) for d in destinations if d is not None])
-    for raw in filter(lambda e: e is not None, destinations):
-        remove(raw)
+    jobs = [(stream, raw) for stream, raw in zip(streams, destinations) if stream is not None]
+    if resume:
+        # tracks converted by an earlier attempt
+        jobs = [(stream, raw) for stream, raw in jobs if not raw.with_suffix('.mp3').exists()]
+    ui.show(f'Downloading and converting to mp3 ({converter.workers} converters)')
+    try:
+        metrics = await _download_and_convert_async(jobs, dest, client, converter, tracker)
+    finally:
+        tracker.close()
+    ui.show('\n'.join(str(m) for m in [extract_metrics] + metrics))
     return dest
 
 
-async def download_album_to_lib_async(album: Album, library):
+async def download_album_to_lib_async(album: Album, library, client: HttpClient = None,
+                                      converter: ConversionScheduler = None, extractor: StreamExtractor = None,
+                                      resume=False, year=None):
     dest = library.location.joinpath(album.artist.name)
     dest.mkdir(exist_ok=True)
-    album_path = await download_album_async(album, dest)
-    library.add_album(album_path, performer=album.artist.name,
-                      inside_ok=True, interactive=False)
+    album_path = await download_album_async(album, dest, client, converter, extractor, resume, year)
+    # add_album waits for the library lock, which the main thread may hold at a prompt for a long time
+    await get_event_loop().run_in_executor(None, _add_to_library, library, album_path, album.artist.name,
+                                           ui.get_thread_ui())
+
+
+def _add_to_library(library, album_path, performer, thread_ui):
+    set_thread_ui(thread_ui)
+    try:
+        library.add_album(album_path, performer=performer, inside_ok=True, interactive=False)
+    finally:
+        set_thread_ui(None)
@@ -0,0 +1,82 @@
+import os
+from asyncio import Semaphore
+from time import perf_counter
+from pathlib import Path
+from .music_converter import convert_to_audio_async, convert_stream_to_audio_async
+
+__all__ = ['StageMetrics', 'ConversionScheduler']
+
+
+class _Measurement:
+    def __init__(self, metrics, size):
+        self._metrics = metrics
+        self._size = size
+        self._start = None
+
+    def __enter__(self):
+        self._start = perf_counter()
+        if self._metrics.first_start is None:
+            self._metrics.first_start = self._start
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = perf_counter()
+        self._metrics.busy_time += end - self._start
+        self._metrics.last_end = end
+        if exc_type is None:
+            self._metrics.items += 1
+            self._metrics.bytes += self._size
+        else:
+            self._metrics.errors += 1
+
+
+class StageMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.bytes = 0
+        self.busy_time = 0
+        self.first_start = None
+        self.last_end = None
+        self.max_queue = 0
+
+    def measure(self, size=0):
+        return _Measurement(self, size)
+
+    def observe_queue(self, size):
+        self.max_queue = max(self.max_queue, size)
+
+    @property
+    def wall_time(self):
+        if self.first_start is None or self.last_end is None:
+            return 0
+        return self.last_end - self.first_start
+
+    def __str__(self):
+        wall = self.wall_time
+        speed = f'{self.bytes / wall / 1024 / 1024:.2f} MB/s, ' if wall > 0 and self.bytes > 0 else ''
+        rate = f'{self.items / wall:.2f} items/s' if wall > 0 else '-'
+        return (f'{self.name}: {self.items} items ({self.errors} failed), {self.bytes / 1024 / 1024:.1f} MB '
+                f'in {wall:.1f}s ({speed}{rate}), busy {self.busy_time:.1f}s, max queue {self.max_queue}')
+
+
+class ConversionScheduler:
+    def __init__(self, workers=0):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = Semaphore(self.workers)
+        return self._semaphore
+
+    async def convert(self, src: Path, dest_folder: Path, audio_format='mp3'):
+        async with self._get_semaphore():
+            await convert_to_audio_async(src, dest_folder, audio_format)
+
+    async def convert_stream(self, chunks, dest: Path, audio_format='mp3'):
+        # ffmpeg runs for the whole transfer, so the slot is held while downloading; this bounds the number of
+        # ffmpeg processes. Slow streams can delay file-based conversions, which are only used for non-WebM audio
+        async with self._get_semaphore():
+            await convert_stream_to_audio_async(chunks, dest, audio_format)
@@ -0,0 +1,118 @@
+import os
+import json
+from asyncio import gather, sleep, ensure_future, TimeoutError
+from random import uniform
+import aiohttp
+from .http_client import HttpClient
+
+__all__ = ['DownloadCheckpoint', 'download_file_async']
+
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+
+class DownloadCheckpoint:
+    def __init__(self, file, size):
+        self._location = f'{file}.part'
+        self._size = size
+        self.segments = None
+        if os.path.exists(self._location) and os.path.exists(file):
+            try:
+                with open(self._location) as f:
+                    data = json.load(f)
+                if data['size'] == size:
+                    self.segments = data['segments']
+            except (OSError, ValueError, KeyError, TypeError):
+                # a damaged checkpoint only costs the progress it recorded
+                self.segments = None
+
+    def split(self, count):
+        count = max(1, min(count, self._size // MIN_SEGMENT_SIZE))
+        bounds = [self._size * i // count for i in range(count + 1)]
+        self.segments = [[start, end, start] for start, end in zip(bounds, bounds[1:])]
+
+    @property
+    def downloaded(self):
+        return sum(position - start for start, _, position in self.segments)
+
+    def exists(self):
+        return os.path.exists(self._location)
+
+    def save(self):
+        tmp = f'{self._location}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'size': self._size, 'segments': self.segments}, f)
+        os.replace(tmp, self._location)
+
+    def remove(self):
+        if os.path.exists(self._location):
+            os.remove(self._location)
+
+
+def _pwrite(fd, data, offset):
+    if hasattr(os, 'pwrite'):
+        return os.pwrite(fd, data, offset)
+    # no awaits between seek and write, so segments sharing the descriptor can not interleave here
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.write(fd, data)
+
+
+async def _download_segment_async(url, fd, segment, client: HttpClient, chunk_size, on_chunk_read, retries,
+                                  checkpoint: DownloadCheckpoint):
+    attempt = 0
+    while segment[2] < segment[1]:
+        try:
+            headers = {'Range': f'bytes={segment[2]}-{segment[1] - 1}'}
+            async with client.get(url, headers=headers) as resp:
+                if resp.status == 200 and segment[2] > 0:
+                    raise aiohttp.ClientPayloadError('Server ignored Range header')
+                resp.raise_for_status()
+                while segment[2] < segment[1]:
+                    chunk = await resp.content.read(chunk_size)
+                    if not chunk:
+                        break
+                    chunk = chunk[:segment[1] - segment[2]]
+                    _pwrite(fd, chunk, segment[2])
+                    segment[2] += len(chunk)
+                    checkpoint.save()
+                    on_chunk_read(len(chunk))
+                    await client.throttle(len(chunk))
+            if segment[2] < segment[1]:
+                raise aiohttp.ClientPayloadError(f'Connection closed at {segment[2]} of {segment[1]} bytes')
+        except (aiohttp.ClientError, TimeoutError):
+            if attempt >= retries:
+                raise
+            await sleep(uniform(0, min(30, 2 ** attempt)))
+            attempt += 1
+
+
+async def download_file_async(url, dest, size, client: HttpClient, chunk_size, segments=1, retries=3,
+                              on_chunk_read=lambda s: None):
+    checkpoint = DownloadCheckpoint(dest, size)
+    if checkpoint.segments is None and not checkpoint.exists() and os.path.exists(dest) \
+            and os.path.getsize(dest) == size:
+        # the checkpoint is removed only after the size check, so the file was completed by an earlier attempt
+        on_chunk_read(size)
+        return
+    if checkpoint.segments is None:
+        checkpoint.split(segments)
+        mode = os.O_CREAT | os.O_TRUNC
+    else:
+        mode = 0
+    on_chunk_read(checkpoint.downloaded)
+    fd = os.open(str(dest), os.O_WRONLY | getattr(os, 'O_BINARY', 0) | mode)
+    tasks = [ensure_future(_download_segment_async(url, fd, segment, client, chunk_size, on_chunk_read, retries,
+                                                   checkpoint)) for segment in checkpoint.segments]
+    try:
+        checkpoint.save()
+        await gather(*tasks)
+        os.ftruncate(fd, size)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await gather(*tasks, return_exceptions=True)
+        os.close(fd)
+    actual = os.path.getsize(dest)
+    if actual != size or checkpoint.downloaded != size:
+        checkpoint.remove()
+        raise IOError(f'Downloaded {actual} bytes instead of {size}')
+    checkpoint.remove()
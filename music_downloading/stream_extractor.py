@@ -0,0 +1,74 @@
+import re
+from asyncio import get_event_loop
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import time
+from urllib.parse import urlsplit, parse_qs
+from pytube import YouTube, Stream
+from .pipeline import StageMetrics
+
+__all__ = ['StreamExtractor']
+
+EXPIRATION_MARGIN = 5 * 60
+
+
+def _get_query_param(url, name):
+    values = parse_qs(urlsplit(url).query).get(name)
+    return values[0] if values else None
+
+
+def _get_bitrate(stream: Stream):
+    match = re.match(r'\d+', stream.abr or '')
+    return int(match.group()) if match is not None else 0
+
+
+class StreamExtractor:
+    def __init__(self, workers=4, ttl=60 * 60):
+        self.workers = workers
+        self._ttl = ttl
+        self._executor = None
+        self._cache = {}
+        self._lock = Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers)
+        return self._executor
+
+    @staticmethod
+    def choose_audio_stream(streams):
+        return max(streams.filter(only_audio=True), key=_get_bitrate, default=None)
+
+    def _get_expiration(self, stream: Stream):
+        expires_at = time() + self._ttl
+        expire = _get_query_param(stream.url, 'expire')
+        if expire is not None and expire.isdigit():
+            expires_at = min(expires_at, int(expire) - EXPIRATION_MARGIN)
+        return expires_at
+
+    def extract(self, url):
+        video_id = _get_query_param(url, 'v') or url
+        with self._lock:
+            cached = self._cache.get(video_id)
+        if cached is not None and cached[0] > time():
+            return cached[1]
+        stream = self.choose_audio_stream(YouTube(url).streams)
+        if stream is not None:
+            # filesize is lazily fetched with a blocking request, so resolve it on the worker thread
+            stream.filesize
+            now = time()
+            with self._lock:
+                self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+                self._cache[video_id] = (self._get_expiration(stream), stream)
+        return stream
+
+    async def extract_async(self, url, metrics: StageMetrics = None):
+        if metrics is None:
+            return await get_event_loop().run_in_executor(self._get_executor(), self.extract, url)
+        with metrics.measure():
+            return await get_event_loop().run_in_executor(self._get_executor(), self.extract, url)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,10 +1,191 @@
+import re
+import json
+import asyncio
+from datetime import datetime, timezone
+from random import uniform
+from time import monotonic
 import aiohttp
-from settings import get_google_api_key
+from ui import ui
+from settings import get_google_api_key, get_cache_dir, get_youtube_cache_size, get_youtube_api_url, \
+    get_youtube_requests_per_second, get_youtube_daily_quota, get_youtube_max_concurrency
+from .http_client import HttpClient
+from .disk_cache import DiskCache
 
-__all__ = ['resolve_track_async']
+__all__ = ['resolve_track_async', 'resolve_tracks_async', 'get_resolution_cache', 'get_search_scheduler',
+           'QuotaExceededError']
 
+FOUND_TTL = 30 * 24 * 60 * 60
+NOT_FOUND_TTL = 24 * 60 * 60
+THROTTLING_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+_resolution_cache = None
+_search_scheduler = None
+
+
+class QuotaExceededError(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self._rate = rate
+        self._capacity = rate if capacity is None else capacity
+        self._tokens = self._capacity
+        self._updated = monotonic()
+
+    async def acquire(self, amount=1):
+        while True:
+            now = monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return
+            await asyncio.sleep((amount - self._tokens) / self._rate)
+
+
+class DailyQuota:
+    def __init__(self, location, limit):
+        self._location = location
+        self._limit = limit
+        self._day = None
+        self._used = 0
+        if location.exists():
+            with location.open() as f:
+                data = json.load(f)
+            self._day, self._used = data['day'], data['used']
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).date().isoformat()
+
+    @property
+    def used(self):
+        return self._used if self._day == self._today() else 0
+
+    def consume(self, units):
+        used = self.used
+        if used + units > self._limit:
+            raise QuotaExceededError(f'Youtube API daily quota exhausted ({used}/{self._limit} units)')
+        self._day = self._today()
+        self._used = used + units
+        with self._location.open('w') as f:
+            json.dump({'day': self._day, 'used': self._used}, f)
+
+
+class AdaptiveLimiter:
+    def __init__(self, max_limit):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self._active = 0
+        self._successes = 0
+        self._condition = None
+
+    async def __aenter__(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+            self._successes = 0
+
+    def on_throttled(self):
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+
+
+class YoutubeSearchScheduler:
+    search_cost = 100
+
+    def __init__(self, api_url, requests_per_second=5, daily_quota=10000, max_concurrency=8, retries=4,
+                 quota_location=None):
+        self._api_url = api_url
+        self._bucket = TokenBucket(requests_per_second)
+        self._quota = DailyQuota(quota_location or get_cache_dir().joinpath('youtube_quota.json'), daily_quota)
+        self._limiter = AdaptiveLimiter(max_concurrency)
+        self._retries = retries
+
+    @staticmethod
+    def _format_error(err):
+        errors = '\n'.join(' '.join(str(i) for i in e.items()) for e in err.get('errors', []))
+        return f"{err.get('message')}\n{errors}"
+
+    async def _request(self, client: HttpClient, params):
+        async with self._limiter:
+            try:
+                async with client.get(f'{self._api_url}/search', params=params) as resp:
+                    return resp.status, await resp.json(content_type=None), None
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                return None, None, e
+
+    async def search(self, client: HttpClient, params):
+        attempt = 0
+        while True:
+            await self._bucket.acquire()
+            self._quota.consume(self.search_cost)
+            status, data, error = await self._request(client, params)
+            if error is None and 'error' not in data:
+                self._limiter.on_success()
+                return data
+
+            if error is None:
+                err = data['error']
+                reasons = [e.get('reason') for e in err.get('errors', [])]
+                if status == 429 or any(r in THROTTLING_REASONS for r in reasons):
+                    self._limiter.on_throttled()
+                elif status is None or status < 500:
+                    raise RuntimeError(self._format_error(err))
+                error = RuntimeError(self._format_error(err))
+            if attempt >= self._retries:
+                raise error
+            await asyncio.sleep(uniform(0, min(32, 2 ** attempt)))
+            attempt += 1
+
+
+def get_resolution_cache() -> DiskCache:
+    global _resolution_cache
+    if _resolution_cache is None:
+        _resolution_cache = DiskCache(get_cache_dir().joinpath('youtube.sqlite'), max_entries=get_youtube_cache_size())
+    return _resolution_cache
+
+
+def get_search_scheduler() -> YoutubeSearchScheduler:
+    global _search_scheduler
+    if _search_scheduler is None:
+        _search_scheduler = YoutubeSearchScheduler(get_youtube_api_url(), get_youtube_requests_per_second(),
+                                                   get_youtube_daily_quota(), get_youtube_max_concurrency())
+    return _search_scheduler
+
+
+def _normalize(value):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(value).lower()).split())
+
+
+def get_cache_key(performer, name):
+    return f'{_normalize(performer)}\0{_normalize(name)}'
+
+
+def _to_url(video_id):
+    return None if video_id is None else f'https://youtube.com/watch?v={video_id}'
+
+
+async def resolve_track_async(performer, name, client: HttpClient):
+    cache = get_resolution_cache()
+    key = get_cache_key(performer, name)
+    cached = cache.get(key)
+    if cached is not None:
+        return _to_url(json.loads(cached.decode())['video_id'])
 
-async def resolve_track_async(performer, name):
     params = {
         'q': f'{performer} {name}',
         'part': 'id,snippet',
@@ -12,19 +193,27 @@ async def resolve_track_async(performer, name):
         'key': get_google_api_key()
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get('https://www.googleapis.com/youtube/v3/search',
-                               params=params) as resp:
-            resp = await resp.json()
-            if 'error' in resp:
-                err = resp['error']
-                errors = '\n'.join(' '.join(str(i) for i in e.items()) for e in err['errors'])
-                raise RuntimeError(f"{err['message']}\n{errors}")
-
-            tracks = extract_urls_from_api_resp(resp)
-            for title, video_id in tracks:
-                if 'live' not in title.lower():
-                    return f'https://youtube.com/watch?v={video_id}'
+    resp = await get_search_scheduler().search(client, params)
+    tracks = extract_urls_from_api_resp(resp)
+    video_id = next((video_id for title, video_id in tracks if 'live' not in title.lower()), None)
+    cache.set(key, json.dumps({'video_id': video_id, 'candidates': tracks}).encode(),
+              NOT_FOUND_TTL if video_id is None else FOUND_TTL)
+    return _to_url(video_id)
+
+
+async def resolve_tracks_async(tracks, client: HttpClient, then=None):
+    async def resolve(track):
+        url = await resolve_track_async(track.artist, track.title, client)
+        return url if then is None or url is None else await then(url)
+
+    results = await asyncio.gather(*[resolve(track) for track in tracks], return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    for error in {str(f) for f in failures}:
+        ui.show(f'Track search failed: {error}')
+    if len(failures) > 0:
+        # found tracks are cached, so a retry repeats only the failed searches
+        raise failures[0]
+    return results
 
 
 def extract_urls_from_api_resp(data):
@@ -3,5 +3,15 @@ from .music_library import *
 from .track import *
 from .case_non_sensitive_dict import *
 from .copy import *
+from .directory_index import *
+from .library_storage import *
+from .scanner import *
+from .exporter import *
+from .batch_import import *
+from .album_probe import *
+from .tag_reader import *
 
-__all__ = album.__all__ + track.__all__ + music_library.__all__ + case_non_sensitive_dict.__all__ + copy.__all__
+__all__ = album.__all__ + track.__all__ + music_library.__all__ + case_non_sensitive_dict.__all__ + copy.__all__ + \
+          directory_index.__all__ + library_storage.__all__ + scanner.__all__ + \
+          exporter.__all__ + batch_import.__all__ + album_probe.__all__ + \
+          tag_reader.__all__
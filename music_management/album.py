@@ -1,18 +1,33 @@
 from typing import List
 from os.path import join
+from sys import intern
 from .track import Track
 
 __all__ = ['Album']
 
+_FIELDS = ('performer', 'year', 'name', 'tracks', 'cue_name', 'cover_name')
+
 
 class Album:
+    __slots__ = _FIELDS
+
     def __init__(self, performer, year, name, tracks=None, cue_name: str = None, cover_name: str = None):
-        self.performer = performer
+        self.performer = intern(performer)
         self.name = name
         self.year = year
         self.tracks: List[Track] = tracks
         self.cue_name = cue_name
-        self.cover_name = cover_name
+        self.cover_name = None if cover_name is None else intern(cover_name)
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in _FIELDS)
+
+    def __setstate__(self, state):
+        # pickles made before __slots__ hold the instance __dict__
+        if isinstance(state, dict):
+            self.__init__(**state)
+        else:
+            self.__init__(*state)
 
     def get_location(self, root):
         return root.joinpath(self.performer, repr(self))
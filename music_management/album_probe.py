@@ -0,0 +1,151 @@
+import os
+import sqlite3
+from time import time
+from pathlib import Path
+from pickle import dumps, loads, UnpicklingError
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+from deflacue.deflacue import CueParser
+from .directory_index import get_mtime
+from .tag_reader import AudioInfo, read_audio_info
+
+__all__ = ['AlbumProbe', 'AlbumProber']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER,
+    probe BLOB NOT NULL,
+    used_at REAL
+);
+'''
+
+
+class AlbumProbe(NamedTuple):
+    mtime: Optional[int]
+    files: Dict[str, int]
+    cue_name: Optional[str]
+    cue_mtime: Optional[int]
+    cue_globals: Optional[dict]
+    cue_tracks: Optional[List[dict]]
+    audio: Optional[Dict[str, Optional[AudioInfo]]] = None
+
+    def has_file(self, name):
+        return name in self.files
+
+    def get_audio(self, name) -> Optional[AudioInfo]:
+        return None if self.audio is None else self.audio.get(name)
+
+
+class AlbumProber:
+    """Lists album folder, parses its CUE and audio headers once, results are cached by folder and CUE mtime"""
+
+    # probes are written in batches, a crash loses at most this many
+    flush_size = 256
+
+    def __init__(self, location: Path, root: Path, audio_extensions=(), workers=4):
+        self._location = location
+        self._root = root
+        self._audio_extensions = audio_extensions
+        # separate from the callers pools, probes are often run from them
+        self._executor = ThreadPoolExecutor(workers)
+        self._lock = Lock()
+        self._connection = sqlite3.connect(str(location), check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+        # changed probes waiting for the next flush, None marks a forgotten folder
+        self._pending: Dict[str, Optional[AlbumProbe]] = {}
+        self._used = set()
+        self._started_at = time()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _list(path: Path):
+        files = {}
+        with os.scandir(str(path)) as it:
+            for entry in it:
+                if entry.is_file():
+                    files[entry.name] = entry.stat().st_size
+        return files
+
+    def _is_fresh(self, path: Path, probe: AlbumProbe, mtime):
+        if probe.mtime is None or probe.mtime != mtime or probe.audio is None:
+            return False
+        return probe.cue_name is None or get_mtime(path.joinpath(probe.cue_name)) == probe.cue_mtime
+
+    def _is_inside(self, key):
+        return self._root in Path(key).parents
+
+    def _load(self, key, mtime) -> Optional[AlbumProbe]:
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            row = self._connection.execute('SELECT probe FROM probes WHERE path = ? AND mtime IS ?',
+                                           (key, mtime)).fetchone()
+        if row is None:
+            return None
+        try:
+            return loads(row[0])
+        except (EOFError, UnpicklingError, ValueError, AttributeError, TypeError):
+            return None
+
+    def probe(self, path: Path) -> AlbumProbe:
+        key = str(path)
+        mtime = get_mtime(path)
+        if not self._is_inside(key):
+            with self._lock:
+                self._used.add(key)
+        cached = self._load(key, mtime)
+        if cached is not None and self._is_fresh(path, cached, mtime):
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        files = self._list(path)
+        cues = sorted(name for name in files if name.endswith('.cue'))
+        cue_name, cue_mtime, cue_globals, cue_tracks = None, None, None, None
+        if len(cues) > 0:
+            cue_name = cues[0]
+            cue_mtime = get_mtime(path.joinpath(cue_name))
+            cue = CueParser(str(path.joinpath(cue_name).absolute()))
+            cue_globals = cue.get_data_global()
+            cue_tracks = cue.get_data_tracks()
+        audio_files = sorted(name for name in files if Path(name).suffix.lower() in self._audio_extensions)
+        audio = dict(zip(audio_files, self._executor.map(lambda name: read_audio_info(str(path.joinpath(name))),
+                                                         audio_files)))
+        probe = AlbumProbe(mtime, files, cue_name, cue_mtime, cue_globals, cue_tracks, audio)
+        with self._lock:
+            self._pending[key] = probe
+            if len(self._pending) >= self.flush_size:
+                self._flush()
+        return probe
+
+    def forget(self, path: Path):
+        with self._lock:
+            self._pending[str(path)] = None
+
+    def _flush(self):
+        changed = [(k, v.mtime, dumps(v), None if self._is_inside(k) else self._started_at)
+                   for k, v in self._pending.items() if v is not None]
+        forgotten = [(k,) for k, v in self._pending.items() if v is None]
+        with self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO probes (path, mtime, probe, used_at) '
+                                         'VALUES (?, ?, ?, ?)', changed)
+            self._connection.executemany('DELETE FROM probes WHERE path = ?', forgotten)
+        self._pending.clear()
+
+    def save(self):
+        with self._lock:
+            self._flush()
+            # folders outside the library (e.g. import sources) are kept only while they are probed
+            with self._connection:
+                self._connection.executemany('UPDATE probes SET used_at = ? WHERE path = ?',
+                                             [(self._started_at, k) for k in self._used])
+                self._connection.execute('DELETE FROM probes WHERE used_at < ?', (self._started_at,))
+
+    def close(self):
+        self.save()
+        self._executor.shutdown()
+        self._connection.close()
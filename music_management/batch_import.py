@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+from typing import List, Dict
+from .album import Album
+from .track import Track
+
+__all__ = ['AlbumCandidate', 'write_review_file', 'read_review_file']
+
+
+class AlbumCandidate:
+    def __init__(self, path: Path, performer=None, year=None, title=None, tracks: List[Track] = None,
+                 cue_name=None, cover_name=None):
+        self.path = path
+        self.performer = performer
+        self.year = year
+        self.title = title
+        self.tracks = tracks
+        self.cue_name = cue_name
+        self.cover_name = cover_name
+        self.probe = None
+        self.problems: List[str] = []
+
+    @property
+    def resolved(self):
+        return len(self.problems) == 0
+
+    def to_album(self):
+        return Album(self.performer, self.year, self.title, self.tracks, self.cue_name, self.cover_name)
+
+    def __str__(self):
+        result = f'{self.path}\n    {self.performer or "?"} - {self.year or "?"} - {self.title or "?"}'
+        if not self.resolved:
+            result += f' ({", ".join(self.problems)})'
+        return result
+
+
+def write_review_file(location: Path, candidates: List[AlbumCandidate]):
+    with location.open('w', encoding='utf-8') as f:
+        json.dump([{'path': str(c.path), 'performer': c.performer, 'year': c.year, 'title': c.title,
+                    'problems': c.problems} for c in candidates], f, indent=2, ensure_ascii=False)
+
+
+def read_review_file(location: Path) -> Dict[Path, dict]:
+    with location.open(encoding='utf-8') as f:
+        entries = json.load(f)
+    return {Path(e['path']): {k: e.get(k) for k in ('performer', 'year', 'title')} for e in entries}
@@ -1,30 +1,54 @@
-from collections import defaultdict
-from collections.abc import MutableMapping
-
 __all__ = ['CaseNonSensitiveDict']
 
 
-class CaseNonSensitiveDict(MutableMapping):
+class CaseNonSensitiveDict(dict):
+    """dict with lowercased keys, missing keys are filled by default_factory as in defaultdict"""
+
+    __slots__ = ('default_factory',)
+
     def __init__(self, default_factory=None):
-        self._dict = defaultdict(default_factory)
+        super().__init__()
+        self.default_factory = default_factory
+
+    def __missing__(self, key):
+        if self.default_factory is None:
+            raise KeyError(key)
+        value = self.default_factory()
+        super().__setitem__(key, value)
+        return value
 
     def __delitem__(self, key):
-        del self._dict[key]
+        super().__delitem__(key.lower())
 
     def __setitem__(self, key, value):
-        self._dict[key.lower()] = value
-
-    def __len__(self):
-        return len(self._dict)
+        super().__setitem__(key.lower(), value)
 
     def __getitem__(self, key):
-        return self._dict[key.lower()]
-
-    def __iter__(self):
-        return iter(self._dict)
+        return super().__getitem__(key.lower())
 
     def __contains__(self, item):
-        return item.lower() in self._dict
+        return super().__contains__(item.lower())
+
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+    def pop(self, key, *default):
+        return super().pop(key.lower(), *default)
+
+    def setdefault(self, key, default=None):
+        return super().setdefault(key.lower(), default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __reduce__(self):
+        return self.__class__, (self.default_factory,), None, None, iter(self.items())
+
+    def __setstate__(self, state):
+        # pickles made before this class subclassed dict hold the wrapped defaultdict with lowercased keys
+        self.default_factory = state['_dict'].default_factory
+        super().update(state['_dict'])
 
     def copy(self):
-        return self._dict.copy()
+        return dict(self)
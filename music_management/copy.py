@@ -1,16 +1,150 @@
-from os.path import getsize, abspath, basename
+import os
+import sys
+import errno
 import shutil
-from .shutil_monkey_patching import patch_shutil
+from concurrent.futures import ThreadPoolExecutor
+from os.path import getsize, abspath, basename, dirname, isdir, join, exists, samefile
+from threading import BoundedSemaphore, local
 from utils import ProgressTracker
 
-__all__ = ['copy_with_progress']
+__all__ = ['copy_with_progress', 'copy_file', 'CopyScheduler']
+
+SLICE_SIZE = 8 * 1024 * 1024
+BUFFER_SIZE = 1024 * 1024
+
+_ZERO_COPY_ERRORS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.ENOTSUP)
+_buffers = local()
+
+
+def _copy_file_range(fsrc, fdst, offset):
+    while True:
+        copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), SLICE_SIZE, offset, offset)
+        if copied == 0:
+            return
+        offset += copied
+        yield copied
+
+
+def _sendfile(fsrc, fdst, offset):
+    fdst.seek(offset)
+    while True:
+        sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, SLICE_SIZE)
+        if sent == 0:
+            return
+        offset += sent
+        yield sent
+
+
+def _copy_buffered(fsrc, fdst, offset):
+    if not hasattr(_buffers, 'buffer'):
+        _buffers.buffer = bytearray(BUFFER_SIZE)
+    buffer = _buffers.buffer
+    view = memoryview(buffer)
+    fsrc.seek(offset)
+    fdst.seek(offset)
+    while True:
+        read = fsrc.readinto(buffer)
+        if not read:
+            return
+        fdst.write(view[:read])
+        yield read
+
+
+_strategies = [s for s, available in ((_copy_file_range, hasattr(os, 'copy_file_range')),
+                                      (_sendfile, hasattr(os, 'sendfile') and sys.platform.startswith('linux')))
+               if available]
+_strategies.append(_copy_buffered)
+
+
+def copy_file(src, dest, on_progress=lambda count: None):
+    if isdir(dest):
+        dest = join(dest, basename(src))
+    if exists(dest) and samefile(src, dest):
+        raise shutil.SameFileError(f'{src} and {dest} are the same file')
+
+    with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        for strategy in _strategies:
+            try:
+                for copied in strategy(fsrc, fdst, offset):
+                    offset += copied
+                    on_progress(copied)
+            except OSError as e:
+                if strategy is _copy_buffered or e.errno not in _ZERO_COPY_ERRORS:
+                    raise
+                continue
+            # some file systems (procfs, overlays) report 0 copied bytes instead of an error,
+            # so the next strategy continues from the offset reached
+            if offset >= size:
+                break
+        if offset < size:
+            raise OSError(errno.EIO, f'Copied {offset} of {size} bytes', src)
+    shutil.copystat(src, dest)
+    return dest
 
 
 def copy_with_progress(src, dest):
     src = abspath(src)
     dest = abspath(dest)
     size = getsize(src)
-    tracker = ProgressTracker(size, f'Copying {basename(src)}')
-    patch_shutil(tracker.add_progress)
-    shutil.copy2(src, dest)
+    tracker = ProgressTracker(max(1, size), f'Copying {basename(src)}')
+    copy_file(src, dest, tracker.add_progress)
     tracker.close()
+
+
+class CopyScheduler:
+    def __init__(self, workers=4, per_device_limit=0, onerror=None):
+        self._workers = max(1, workers)
+        self._per_device_limit = per_device_limit
+        self._onerror = onerror
+        self._device_semaphores = {}
+        self._tasks = []
+        self._tracker = None
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def _get_device_semaphore(self, dest):
+        if self._per_device_limit <= 0:
+            return None
+        device = os.stat(dest if isdir(dest) else dirname(dest)).st_dev
+        if device not in self._device_semaphores:
+            self._device_semaphores[device] = BoundedSemaphore(self._per_device_limit)
+        return self._device_semaphores[device]
+
+    def add(self, src, dest, on_done=None):
+        src = abspath(src)
+        dest = abspath(dest)
+        self._tasks.append((getsize(src), src, dest, self._get_device_semaphore(dest), on_done))
+
+    def _copy(self, task):
+        _, src, dest, semaphore, on_done = task
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            copy_file(src, dest, self._tracker.add_progress)
+        except OSError:
+            if self._onerror is None:
+                raise
+            self._onerror(src, sys.exc_info())
+            return False
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        if on_done is not None:
+            on_done()
+        return True
+
+    def run(self, msg='Copying'):
+        tasks = sorted(self._tasks, key=lambda t: t[0], reverse=True)
+        self._tasks = []
+        if len(tasks) == 0:
+            return True
+        self._tracker = ProgressTracker(max(1, sum(t[0] for t in tasks)), f'{msg} ({len(tasks)} files)')
+        try:
+            with ThreadPoolExecutor(min(self._workers, len(tasks))) as pool:
+                results = list(pool.map(self._copy, tasks))
+        finally:
+            self._tracker.close()
+        return all(results)
@@ -0,0 +1,64 @@
+from pathlib import Path
+from pickle import dump, load, UnpicklingError
+from typing import Dict, List, NamedTuple, Optional
+
+__all__ = ['DirectoryIndex', 'DirectoryState']
+
+
+def get_mtime(path: Path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class DirectoryState(NamedTuple):
+    mtime: int
+    has_tracks: bool
+    unknown_children: Dict[str, Optional[int]]
+
+
+class DirectoryIndex:
+    def __init__(self, location: Path):
+        self._location = location
+        self._root_mtime = None
+        self._root_children: List[str] = []
+        self._dirs: Dict[str, DirectoryState] = {}
+        self.loaded = self._load()
+
+    def _load(self):
+        if not self._location.exists():
+            return False
+        try:
+            with self._location.open('rb') as f:
+                self._root_mtime, self._root_children, self._dirs = load(f)
+        except (OSError, EOFError, UnpicklingError, ValueError):
+            return False
+        return True
+
+    def save(self):
+        with self._location.open('wb') as f:
+            dump((self._root_mtime, self._root_children, self._dirs), f)
+
+    def get_children(self, root: Path, mtime):
+        if self.loaded and mtime is not None and mtime == self._root_mtime:
+            return [root.joinpath(name) for name in self._root_children]
+
+    def record_root(self, mtime, children: List[str]):
+        self._root_mtime = mtime
+        self._root_children = children
+        names = set(children)
+        self._dirs = {k: v for k, v in self._dirs.items() if k in names}
+
+    def get(self, name) -> Optional[DirectoryState]:
+        return self._dirs.get(name)
+
+    def is_unchanged(self, path: Path):
+        state = self._dirs.get(path.name)
+        return state is not None and not state.has_tracks and state.mtime == get_mtime(path)
+
+    def record(self, name, state: DirectoryState):
+        self._dirs[name] = state
+
+    def forget(self, name):
+        self._dirs.pop(name, None)
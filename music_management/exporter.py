@@ -0,0 +1,173 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, groupby
+from threading import Lock
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from ui import ui
+from .copy import CopyScheduler
+
+__all__ = ['LibraryExporter', 'ExportManifest', 'ExportPlan', 'ManifestEntry']
+
+_MTIME_TOLERANCE = 2 * 10 ** 9
+
+
+def _hash_file(path, chunk_size=1024 * 1024):
+    result = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            result.update(data)
+    return result.hexdigest()
+
+
+class ManifestEntry(NamedTuple):
+    size: int
+    mtime: int
+    hash: Optional[str] = None
+
+    def matches(self, other: 'ManifestEntry', tolerance=0):
+        if self.size != other.size or abs(self.mtime - other.mtime) > tolerance:
+            return False
+        return self.hash is None or other.hash is None or self.hash == other.hash
+
+
+class ExportManifest:
+    file_name = 'library.manifest'
+
+    def __init__(self, root: Path):
+        self._location = root.joinpath(self.file_name)
+        self.files: Dict[str, ManifestEntry] = {}
+        self.exists = self._location.exists()
+        if self.exists:
+            with self._location.open() as f:
+                self.files = {k: ManifestEntry(*v) for k, v in json.load(f)['files'].items()}
+
+    def save(self):
+        tmp = self._location.with_suffix('.tmp')
+        with tmp.open('w') as f:
+            json.dump({'version': 1, 'files': self.files}, f, separators=(',', ':'))
+        os.replace(str(tmp), str(self._location))
+
+
+class ExportPlan(NamedTuple):
+    adds: List[str]
+    updates: List[str]
+    deletions: List[str]
+    source: Dict[str, ManifestEntry]
+
+    def is_empty(self):
+        return len(self.adds) == len(self.updates) == len(self.deletions) == 0
+
+    @staticmethod
+    def _albums_repr(files):
+        result = []
+        albums = sorted({PurePosixPath(f).parts[:2] for f in files})
+        for performer, performer_albums in groupby(albums, key=lambda e: e[0]):
+            result.append(f'{performer}:')
+            result.extend(f'    {"/".join(a[1:])}' for a in performer_albums)
+        return '\n'.join(result)
+
+    def __str__(self):
+        result = []
+        for title, files in (('copied', self.adds), ('updated', self.updates), ('removed', self.deletions)):
+            if len(files) > 0:
+                result.append(f'These albums will be {title} ({len(files)} files)\n{self._albums_repr(files)}')
+        result.append('\n')
+        return '\n'.join(result)
+
+
+class LibraryExporter:
+    save_manifest_every = 50
+
+    def __init__(self, source: Path, target: Path, verify_hash=False, workers=8, scheduler: CopyScheduler = None):
+        self._source = source
+        self._target = target
+        self._verify_hash = verify_hash
+        self._workers = max(1, workers)
+        self._scheduler = CopyScheduler() if scheduler is None else scheduler
+        self._manifest = ExportManifest(target)
+        self._manifest_lock = Lock()
+        self._unsaved = 0
+
+    def _stat_album(self, album_location) -> Dict[str, ManifestEntry]:
+        result = {}
+        pending = [self._source.joinpath(album_location)]
+        while pending:
+            try:
+                entries = list(os.scandir(pending.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(Path(entry.path))
+                elif entry.is_file():
+                    st = entry.stat()
+                    file_hash = _hash_file(entry.path) if self._verify_hash else None
+                    rel = Path(entry.path).relative_to(self._source).as_posix()
+                    result[rel] = ManifestEntry(st.st_size, st.st_mtime_ns, file_hash)
+        return result
+
+    def _stat_target(self, rel):
+        try:
+            st = self._target.joinpath(rel).stat()
+        except OSError:
+            return None
+        return ManifestEntry(st.st_size, st.st_mtime_ns)
+
+    def plan(self, album_locations: Iterable[str]) -> ExportPlan:
+        with ThreadPoolExecutor(self._workers) as pool:
+            source = dict(chain.from_iterable(d.items() for d in pool.map(self._stat_album, album_locations)))
+            if not self._manifest.exists:
+                existing = zip(source, pool.map(self._stat_target, source))
+                self._manifest.files = {rel: source[rel] for rel, entry in existing
+                                        if entry is not None and entry.matches(source[rel], _MTIME_TOLERANCE)}
+
+        exported = self._manifest.files
+        adds = [rel for rel in source if rel not in exported]
+        updates = [rel for rel, entry in source.items() if rel in exported and not entry.matches(exported[rel])]
+        deletions = [rel for rel in exported if rel not in source]
+        return ExportPlan(adds, updates, deletions, source)
+
+    def _remove_empty_parents(self, path: Path):
+        for parent in path.parents:
+            if parent == self._target or self._target not in parent.parents:
+                return
+            try:
+                parent.rmdir()
+            except OSError:
+                return
+
+    def apply(self, plan: ExportPlan):
+        for rel in plan.deletions:
+            dest = self._target.joinpath(rel)
+            try:
+                dest.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                ui.show(f'{dest}\n{str(e)}')
+                continue
+            del self._manifest.files[rel]
+            self._remove_empty_parents(dest)
+        self._manifest.save()
+
+        for rel in chain(plan.adds, plan.updates):
+            dest = self._target.joinpath(rel)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            self._scheduler.add(self._source.joinpath(rel), dest,
+                                lambda rel=rel: self._on_copied(rel, plan.source[rel]))
+        self._scheduler.run('Exporting')
+        self._manifest.save()
+
+    def _on_copied(self, rel, entry: ManifestEntry):
+        with self._manifest_lock:
+            self._manifest.files[rel] = entry
+            self._unsaved += 1
+            if self._unsaved >= self.save_manifest_every:
+                self._manifest.save()
+                self._unsaved = 0
@@ -0,0 +1,161 @@
+import sqlite3
+from pathlib import Path
+from pickle import load
+from threading import Lock
+from typing import Iterable
+from .album import Album
+from .track import Track
+from .case_non_sensitive_dict import CaseNonSensitiveDict
+
+__all__ = ['LibraryStorage']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS performers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS performers_name_lower ON performers (name_lower);
+
+CREATE TABLE IF NOT EXISTS albums (
+    id INTEGER PRIMARY KEY,
+    performer_id INTEGER NOT NULL REFERENCES performers (id) ON DELETE CASCADE,
+    performer TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    cue_name TEXT,
+    cover_name TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS albums_performer_year_title ON albums (performer_id, year, title COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    album_id INTEGER NOT NULL REFERENCES albums (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    cue_offset TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_album ON tracks (album_id, position);
+'''
+
+_MIGRATIONS = [
+    '''
+    ALTER TABLE tracks ADD COLUMN duration REAL;
+    ALTER TABLE tracks ADD COLUMN bitrate INTEGER;
+    ALTER TABLE tracks ADD COLUMN sample_rate INTEGER;
+    ALTER TABLE tracks ADD COLUMN channels INTEGER;
+    ALTER TABLE tracks ADD COLUMN size INTEGER;
+    ''',
+]
+
+_TRACK_FIELDS = ('name', 'path', 'offset', 'duration', 'bitrate', 'sample_rate', 'channels', 'size')
+
+
+class LibraryStorage:
+    def __init__(self, location: Path):
+        self._location = location
+        self._lock = Lock()
+        self._connection = sqlite3.connect(str(location), check_same_thread=False)
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+        self._migrate()
+
+    @property
+    def location(self):
+        return self._location
+
+    def _migrate(self):
+        version, = self._connection.execute('PRAGMA user_version').fetchone()
+        for i, script in enumerate(_MIGRATIONS[version:], version + 1):
+            with self._connection:
+                self._connection.executescript(f'BEGIN; {script} PRAGMA user_version = {i}; COMMIT;')
+
+    def close(self):
+        self._connection.close()
+
+    def migrate_from_pickle(self, metadata: Path):
+        if not metadata.exists():
+            return False
+        with metadata.open('rb') as f:
+            library = load(f)
+        with self._connection:
+            for albums in library.values():
+                for album in albums:
+                    try:
+                        self._insert_album(album)
+                    except sqlite3.IntegrityError:
+                        continue
+        metadata.rename(metadata.with_suffix('.metadata.bak'))
+        return True
+
+    def load(self):
+        # tracks are the bulk of the library and are only read on demand by load_tracks
+        library = CaseNonSensitiveDict(list)
+        for performer, year, title, cue_name, cover_name in self._connection.execute(
+                'SELECT performer, year, title, cue_name, cover_name FROM albums ORDER BY performer_id, id'):
+            library[performer].append(Album(performer, year, title, None, cue_name, cover_name))
+        return library
+
+    def load_tracks(self, albums: Iterable[Album]):
+        albums = {(a.performer.lower(), a.year, a.name.lower()): a for a in albums}
+        if len(albums) == 0:
+            return
+        for album in albums.values():
+            album.tracks = []
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT a.performer, a.year, a.title, t.name, t.path, t.cue_offset, t.duration, t.bitrate, '
+                't.sample_rate, t.channels, t.size FROM tracks t JOIN albums a ON a.id = t.album_id '
+                'ORDER BY t.album_id, t.position').fetchall()
+        for performer, year, title, *fields in rows:
+            album = albums.get((performer.lower(), year, title.lower()))
+            if album is not None:
+                album.tracks.append(Track(*fields))
+
+    def _get_or_create_performer(self, name):
+        row = self._connection.execute('SELECT id FROM performers WHERE name_lower = ?', (name.lower(),)).fetchone()
+        if row is not None:
+            return row[0]
+        return self._connection.execute('INSERT INTO performers (name, name_lower) VALUES (?, ?)',
+                                        (name, name.lower())).lastrowid
+
+    def _insert_album(self, album: Album):
+        performer_id = self._get_or_create_performer(album.performer)
+        album_id = self._connection.execute(
+            'INSERT INTO albums (performer_id, performer, year, title, cue_name, cover_name) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (performer_id, album.performer, album.year, album.name, album.cue_name, album.cover_name)).lastrowid
+        self._insert_tracks(album_id, album.tracks)
+
+    def _insert_tracks(self, album_id, tracks):
+        self._connection.executemany(
+            'INSERT INTO tracks (album_id, position, name, path, cue_offset, duration, bitrate, sample_rate, '
+            'channels, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            ((album_id, i) + tuple(getattr(t, f, None) for f in _TRACK_FIELDS) for i, t in enumerate(tracks or ())))
+
+    def add_album(self, album: Album):
+        with self._lock, self._connection:
+            self._insert_album(album)
+
+    def update_tracks(self, album: Album):
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT id FROM albums WHERE performer_id = (SELECT id FROM performers WHERE name_lower = ?) '
+                'AND year = ? AND title = ? COLLATE NOCASE',
+                (album.performer.lower(), album.year, album.name)).fetchone()
+            if row is None:
+                return
+            self._connection.execute('DELETE FROM tracks WHERE album_id = ?', row)
+            self._insert_tracks(row[0], album.tracks)
+
+    def remove_albums(self, albums: Iterable[Album]):
+        with self._lock, self._connection:
+            for album in albums:
+                self._connection.execute(
+                    'DELETE FROM albums WHERE performer_id = '
+                    '(SELECT id FROM performers WHERE name_lower = ?) AND year = ? AND title = ? COLLATE NOCASE',
+                    (album.performer.lower(), album.year, album.name))
+            self._connection.execute('DELETE FROM performers WHERE id NOT IN (SELECT performer_id FROM albums)')
+
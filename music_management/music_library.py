@@ -1,24 +1,33 @@
+import os
 import re
+import sqlite3
 from os.path import abspath
-from shutil import copytree, rmtree
+from shutil import rmtree
 from music_downloading import LastFM
-from .case_non_sensitive_dict import CaseNonSensitiveDict
 from functools import wraps
-from itertools import chain, groupby
+from threading import RLock
+from itertools import chain
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from pickle import dump
-from deflacue.deflacue import CueParser
 from typing import Dict, List
 from utils import with_upper_first_letter
-from pickle import load
-from .copy import copy_with_progress
+from settings import get_scan_workers, get_export_verify_hash, get_copy_workers, get_copy_workers_per_device
+from .copy import copy_with_progress, CopyScheduler
 from .track import Track
 from ui import ui
 from .album import Album
+from .library_storage import LibraryStorage
+from .directory_index import DirectoryIndex, DirectoryState, get_mtime
+from .scanner import LibraryScanner, DirectoryListing
+from .exporter import LibraryExporter
+from .album_probe import AlbumProbe, AlbumProber
+from .batch_import import AlbumCandidate, write_review_file, read_review_file
 
 __all__ = ['MusicLibrary']
 
 ALBUM_RE = re.compile(r'(^\d{4}) - (.+)$')
+YEAR_RE = re.compile(r'^\d{4}')
 
 
 def parse_path(f=None, *, strict=False):
@@ -47,6 +56,15 @@ def parse_path(f=None, *, strict=False):
     return wrapper
 
 
+def synchronized(f):
+    @wraps(f)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return f(self, *args, **kwargs)
+
+    return wrapper
+
+
 def log_err(path, exc_info):
     _, e, _ = exc_info
     ui.show(f'{path}\n{str(e)}')
@@ -57,14 +75,28 @@ class MusicLibrary:
     covers_extensions = ('.jpeg', '.jpg', '.bmp', '.png')
 
     @parse_path(strict=True)
-    def __init__(self, path):
+    def __init__(self, path, incremental_scan=True):
         self._path: Path = path
-        self._library: Dict[str, List[Album]] = self._load_library(self._path)
-        self._clean_library()
+        self._lock = RLock()
+        self._storage = LibraryStorage(self._path.joinpath('library.db'))
+        self._library: Dict[str, List[Album]] = self._load_library()
+        self._index = DirectoryIndex(self._path.joinpath('library.index'))
+        self._scanner = LibraryScanner(self.supported_types, get_scan_workers())
+        self._prober = AlbumProber(self._path.joinpath('library.probes.db'), self._path, self.supported_types,
+                                   get_scan_workers())
+        self._remove_legacy_probes()
+        self._clean_library(incremental_scan and self._index.loaded)
+
+    def _remove_legacy_probes(self):
+        # probes were kept in a single pickle before, they are rebuilt on demand
+        legacy = self._path.joinpath('library.probes')
+        if legacy.exists():
+            legacy.unlink()
 
     def close(self):
-        with self._metadata.open('wb') as f:
-            dump(self._library, f)
+        self._storage.close()
+        self._index.save()
+        self._prober.close()
         ui.show('Library saved')
 
     def __enter__(self):
@@ -78,8 +110,9 @@ class MusicLibrary:
         return self._path
 
     @property
+    @synchronized
     def library(self):
-        return self._library.items()
+        return list(self._library.items())
 
     @staticmethod
     def _purge(folders):
@@ -89,35 +122,93 @@ class MusicLibrary:
     def _update_albums_data(self):
         pass
 
-    def _remove_non_exists_albums(self):
+    def _remove_non_exists_albums(self, unchanged_dirs=frozenset()):
         for performer, albums in self._library.copy().items():
-            exist_albums = [a for a in albums if a.get_location(self._path).exists()]
+            exist_albums = [a for a in albums
+                            if a.performer in unchanged_dirs or a.get_location(self._path).exists()]
+            if len(exist_albums) != len(albums):
+                removed = [a for a in albums if a not in exist_albums]
+                self._storage.remove_albums(removed)
+                for album in removed:
+                    self._prober.forget(album.get_location(self._path))
             if len(exist_albums) > 0:
                 self._library[performer] = exist_albums
             else:
                 del self._library[performer]
 
-    def _add_all_unknown_albums_from(self, path: Path):
+    def _add_all_unknown_albums_from(self, listing: DirectoryListing):
+        performer = with_upper_first_letter(listing.path.name)
+        exists_albums = set() if performer not in self._library else {repr(a) for a in self._library[performer]}
+        for album in self._scanner.list_dirs(p for p in listing.dirs if p.name not in exists_albums):
+            if album.has_tracks:
+                self.add_album(album.path, performer=performer, inside_ok=True, delete_src=True)
+
+    def _add_changed_unknown_albums_from(self, path: Path):
+        state = self._index.get(path.name)
+        changed = [path.joinpath(name) for name, mtime in state.unknown_children.items()
+                   if get_mtime(path.joinpath(name)) != mtime]
+        if len(changed) == 0:
+            return
+        performer = with_upper_first_letter(path.name)
+        for album in self._scanner.list_dirs(changed):
+            if album.has_tracks:
+                self.add_album(album.path, performer=performer, inside_ok=True, delete_src=True)
+        self._index_directory(path)
+
+    def _index_directory(self, path: Path):
+        mtime = get_mtime(path)
+        if mtime is None:
+            self._index.forget(path.name)
+            return
         performer = with_upper_first_letter(path.name)
         exists_albums = set() if performer not in self._library else {repr(a) for a in self._library[performer]}
-        for album_dir in (p for p in path.iterdir()
-                          if p.is_dir() and p.name not in exists_albums and self._is_folder_with_tracks(p)):
-            self.add_album(album_dir, performer=performer, inside_ok=True, delete_src=True)
-
-    def _handle_unknown_albums(self):
-        for path in (p for p in self._path.iterdir() if p.is_dir()):
-            if self._is_folder_with_tracks(path):
+        listing = self._scanner.list_dir(path)
+        unknown_children = {p.path.name: None if p.has_tracks else get_mtime(p.path)
+                            for p in self._scanner.list_dirs(d for d in listing.dirs if d.name not in exists_albums)}
+        self._index.record(path.name, DirectoryState(mtime, listing.has_tracks, unknown_children))
+
+    def _handle_unknown_albums(self, performer_dirs, unchanged_dirs=frozenset()):
+        for path in (p for p in performer_dirs if p.name in unchanged_dirs):
+            self._add_changed_unknown_albums_from(path)
+        for listing in self._scanner.list_dirs(p for p in performer_dirs if p.name not in unchanged_dirs):
+            path = listing.path
+            if listing.has_tracks:
                 self.add_album(path, inside_ok=True, delete_src=True)
             else:
-                self._add_all_unknown_albums_from(path)
-            if path.exists() and len(list(path.iterdir())) == 0:
+                self._add_all_unknown_albums_from(listing)
+            if path.exists() and self._is_empty(path):
                 rmtree(path.absolute(), onerror=log_err)
+            self._index_directory(path)
 
-    def _clean_library(self):
-        self._remove_non_exists_albums()
-        self._update_albums_data()
+    @staticmethod
+    def _is_empty(path: Path):
+        with os.scandir(path) as it:
+            return next(it, None) is None
+
+    def _get_performer_dirs(self, root_mtime, incremental):
+        performer_dirs = self._index.get_children(self._path, root_mtime) if incremental else None
+        if performer_dirs is None:
+            performer_dirs = self._scanner.list_dir(self._path).dirs
+        return performer_dirs
+
+    def _clean_library(self, incremental=False):
+        self._scanner.reset_timings()
+        root_mtime = get_mtime(self._path)
+        with self._scanner.phase('listing performers'):
+            performer_dirs = self._get_performer_dirs(root_mtime, incremental)
+            unchanged_dirs = {p.name for p in performer_dirs if self._index.is_unchanged(p)} if incremental else set()
+        with self._scanner.phase('checking albums'):
+            self._remove_non_exists_albums(unchanged_dirs)
+            self._update_albums_data()
         ui.show('Search for unknown albums in the library')
-        self._handle_unknown_albums()
+        with self._scanner.phase('searching unknown albums'):
+            self._handle_unknown_albums(performer_dirs, unchanged_dirs)
+
+        mtime = get_mtime(self._path)
+        if mtime != root_mtime:
+            performer_dirs = self._scanner.list_dir(self._path).dirs
+        self._index.record_root(mtime, [p.name for p in performer_dirs if p.exists()])
+        ui.show(self._scanner.report())
 
     @staticmethod
     def _get_albums_repr(library):
@@ -129,43 +220,91 @@ class MusicLibrary:
         result.append('\n')
         return '\n'.join(result)
 
+    @synchronized
     def show_library(self):
         albums = self._get_albums_repr(self._library)
         ui.show(albums if albums != '\n' else 'Library is empty')
 
-    def _get_diff(self, other_lib):
-        for performer, albums in self._library.items():
-            albums = set(albums)
-            yield from (albums - set(other_lib._library[performer]))
+    @staticmethod
+    def _format_duration(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f'{hours}:{minutes:02d}:{seconds:02d}'
+
+    def _get_albums_with_tracks(self):
+        albums = [a for albums in self._library.values() for a in albums]
+        self._storage.load_tracks(a for a in albums if a.tracks is None)
+        return albums
+
+    @synchronized
+    def show_stats(self):
+        albums = self._get_albums_with_tracks()
+        tracks = [t for a in albums for t in a.tracks]
+        files = {(str(a.get_location(self._path)), t.path): t for a in albums for t in a.tracks}
+        known = [t for t in tracks if t.duration is not None]
+        duration = sum(t.duration for t in known)
+        with_bitrate = [t for t in known if t.bitrate is not None]
+        bitrate_duration = sum(t.duration for t in with_bitrate)
+        formats = Counter()
+        sizes = Counter()
+        for (_, name), track in files.items():
+            formats[Path(name).suffix.lower()] += 1
+            sizes[Path(name).suffix.lower()] += track.size or 0
+
+        result = [f'Performers: {len(self._library)}, albums: {len(albums)}, tracks: {len(tracks)}',
+                  f'Total duration: {self._format_duration(duration)}, size: {sum(sizes.values()) / 1024 ** 3:.2f} GB']
+        if bitrate_duration > 0:
+            average = sum(t.bitrate * t.duration for t in with_bitrate) / bitrate_duration
+            result.append(f'Average bitrate: {average:.0f} kbps')
+        for extension, count in formats.most_common():
+            result.append(f'    {extension}: {count} files, {sizes[extension] / 1024 ** 3:.2f} GB')
+        missing = len(tracks) - len(known)
+        if missing > 0:
+            result.append(f'Tracks without stream info: {missing}')
+        ui.show('\n'.join(result))
+        return missing
+
+    def _try_probe(self, path: Path):
+        try:
+            return self._prober.probe(path)
+        except Exception as e:
+            ui.show(f'Failed to read {path}: {e}')
+
+    @synchronized
+    def update_track_info(self):
+        albums = [a for a in self._get_albums_with_tracks() if any(t.duration is None for t in a.tracks)]
+        with ThreadPoolExecutor(get_scan_workers()) as pool:
+            probes = list(pool.map(lambda a: self._try_probe(a.get_location(self._path)), albums))
+        updated = 0
+        for album, probe in zip(albums, probes):
+            if probe is not None and self._fill_track_info(album.tracks, probe):
+                self._storage.update_tracks(album)
+                updated += 1
+        ui.show(f'Updated stream info of {updated} albums')
 
     @property
     def _metadata(self):
         return self._path.joinpath('library.metadata')
 
+    @synchronized
     @parse_path
     def export(self, path):
-        diff = list(self._get_diff(MusicLibrary(path)))
-        if len(diff) == 0:
+        exporter = LibraryExporter(self._path, path, get_export_verify_hash(), get_scan_workers(),
+                                   self._get_copy_scheduler())
+        plan = exporter.plan([a.location for albums in self._library.values() for a in albums])
+        if plan.is_empty():
             ui.show('Library is up to date')
             return
-        albums = {k: list(g) for k, g in groupby(diff, key=lambda e: e.performer)}
-        if not ui.ask_ok(f'These albums will be copied from {path.absolute()}\n{self._get_albums_repr(albums)}'):
+        if not ui.ask_ok(f'Export to {path.absolute()}\n{plan}'):
             return
-        for album in diff:
-            src = album.get_location(self._path)
-            dest = album.get_location(path)
-            path.joinpath(album.performer).mkdir(parents=True, exist_ok=True)
-            copytree(src.absolute(), dest.absolute(), copy_function=copy_with_progress)
-        copy_with_progress(self._metadata, path)
+        exporter.apply(plan)
+        copy_with_progress(self._storage.location, path)
         ui.show('Library exported')
 
-    @staticmethod
-    def _load_library(path):
-        cache = list(path.glob('library.metadata'))
-        if len(cache) > 0:
-            with cache[0].open('rb') as f:
-                return load(f)
-        return CaseNonSensitiveDict(list)
+    def _load_library(self):
+        if self._storage.migrate_from_pickle(self._metadata):
+            ui.show('Library metadata migrated to library.db')
+        return self._storage.load()
 
     @property
     def performers(self):
@@ -173,44 +312,55 @@ class MusicLibrary:
                     for k in self._library.keys())
 
     @staticmethod
-    def _get_cue(path):
-        cues = list(path.glob('*.cue'))
-        if len(cues) > 0:
-            return CueParser(cues[0].absolute()), cues[0]
-        return None, None
-
-    @staticmethod
-    def _get_year_and_title(path, cue):
+    def _most_common_tag(probe: AlbumProbe, *keys):
+        for key in keys:
+            values = Counter(info.tags[key] for info in (probe.audio or {}).values()
+                             if info is not None and info.tags.get(key))
+            if len(values) > 0:
+                return values.most_common(1)[0][0]
+
+    @classmethod
+    def _infer_year_and_title(cls, path, probe: AlbumProbe):
         year, title = None, None
         name_match = ALBUM_RE.match(path.name)
         if name_match is not None:
             year, title = name_match.groups()
 
-        if cue is not None:
-            album_data = cue.get_data_global()
+        if probe.cue_globals is not None:
+            album_data = probe.cue_globals
             if year is None and album_data['DATE'] is not None and album_data['DATE'].isdigit():
                 year = album_data['DATE']
             if title is None and album_data['ALBUM'] != 'Unknown':
                 title = album_data['ALBUM']
 
         if year is None:
-            year = ui.get_input_from_user('Enter title release date', read_int=True)
+            year_match = YEAR_RE.match(cls._most_common_tag(probe, 'date') or '')
+            year = None if year_match is None else year_match.group()
+        if title is None:
+            title = cls._most_common_tag(probe, 'album')
         if title is None:
             title = path.name
-        return int(year), with_upper_first_letter(title)
+        return None if year is None else int(year), with_upper_first_letter(title)
 
-    def _get_tracks(self, path: Path, cue, interactive=True):
+    def _get_year_and_title(self, path, probe: AlbumProbe):
+        year, title = self._infer_year_and_title(path, probe)
+        if year is None:
+            year = int(ui.get_input_from_user('Enter title release date', read_int=True))
+        return year, title
+
+    def _get_tracks(self, path: Path, probe: AlbumProbe, interactive=True):
         result = []
-        if cue is not None:
-            tracks_data = cue.get_data_tracks()
-            for data in tracks_data:
+        if probe.cue_tracks is not None:
+            for data in probe.cue_tracks:
                 if data['FILE'] is not None and 'TITLE' in data and 'INDEX' in data:
-                    if Path(data['FILE']).name not in (p.name for p in path.iterdir() if p.is_file()):
+                    if not probe.has_file(Path(data['FILE']).name):
                         ui.show(f'WARNING: {data["FILE"]} declared in .cue not found')
                         continue
                     result.append(Track(data['TITLE'], data['FILE'], data['INDEX']))
         if len(result) == 0:
-            result = [Track(p.stem, p.name) for p in path.iterdir() if p.is_file() if p.suffix in self.supported_types]
+            result = [Track(Path(name).stem, name) for name in sorted(probe.files)
+                      if Path(name).suffix in self.supported_types]
+        self._fill_track_info(result, probe)
 
         tracks = '\n'.join(str(t) for t in result)
         if not interactive or ui.ask_ok(f"These tracks will be added from {path.absolute()}\n{tracks}\n"):
@@ -220,15 +370,39 @@ class MusicLibrary:
         _, result = ui.choose('Enter performer or choose from existing', self.performers)
         return with_upper_first_letter(result)
 
-    def _get_performer(self, cue):
-        result = None
-        if cue is not None:
-            album_data = cue.get_data_global()
-            if album_data['PERFORMER'] != 'Unknown':
-                result = album_data['PERFORMER']
-
+    @staticmethod
+    def _fill_track_info(tracks: List[Track], probe: AlbumProbe):
+        by_file = {}
+        for track in tracks:
+            by_file.setdefault(Path(track.path).name, []).append(track)
+        filled = False
+        for name, file_tracks in by_file.items():
+            info = probe.get_audio(name)
+            if info is None:
+                continue
+            # tracks of a CUE sheet share the file and last until the next track offset
+            for track, next_track in zip(file_tracks, file_tracks[1:] + [None]):
+                try:
+                    end = info.duration if next_track is None else next_track.offset_seconds
+                    track.duration = None if end is None else max(0.0, end - track.offset_seconds)
+                except ValueError:
+                    track.duration = None
+                track.bitrate, track.sample_rate, track.channels = info.bitrate, info.sample_rate, info.channels
+                track.size = info.size
+                filled = True
+        return filled
+
+    @classmethod
+    def _infer_performer(cls, probe: AlbumProbe):
+        if probe.cue_globals is not None and probe.cue_globals['PERFORMER'] != 'Unknown':
+            return probe.cue_globals['PERFORMER']
+        return cls._most_common_tag(probe, 'albumartist', 'artist')
+
+    def _get_performer(self, probe: AlbumProbe):
+        result = self._infer_performer(probe)
         if result is None:
             return self._get_performer_from_user()
+        return result
 
     def _normalize_album_metadata(self, performer, year, title):
         metadata = [performer, year, title]
@@ -258,52 +432,67 @@ class MusicLibrary:
             if index == 3:
                 metadata[2] = with_upper_first_letter(metadata[2])
 
+    @staticmethod
+    def _get_copy_scheduler():
+        return CopyScheduler(get_copy_workers(), get_copy_workers_per_device(), onerror=log_err)
+
+    @staticmethod
+    def _get_album_files(album: Album, path: Path):
+        to_copy = chain(filter(lambda e: e is not None, (album.cover_name, album.cue_name)),
+                        (p.path for p in album.tracks))
+        return set(path.joinpath(p) for p in to_copy)
+
     def _copy_album_to_library(self, album: Album, path: Path):
         destination = album.get_location(self._path)
         destination.mkdir(parents=True, exist_ok=True)
-        to_copy = chain(filter(lambda e: e is not None, (album.cover_name, album.cue_name)),
-                        (p.path for p in album.tracks))
 
-        for src in set(path.joinpath(p) for p in to_copy):
-            copy_with_progress(src, destination)
+        scheduler = self._get_copy_scheduler()
+        for src in self._get_album_files(album, path):
+            scheduler.add(src, destination)
+        if not scheduler.run(f'Copying {album}'):
+            raise OSError(f'Failed to copy {album} to library')
 
-    def _get_or_download_cover(self, performer, title, path):
-        covers = [p for p in path.iterdir() if p.is_file() and p.suffix in self.covers_extensions]
+    def _get_or_download_cover(self, performer, title, path, probe: AlbumProbe):
+        covers = sorted(name for name in probe.files if Path(name).suffix in self.covers_extensions)
         if len(covers) > 0:
-            return covers[0]
+            return path.joinpath(covers[0])
         lf = LastFM()
 
         if lf.try_download_cover(performer, title, path):
             ui.show('Successfully downloaded cover for album')
             return path.joinpath('cover.png')
 
+    @synchronized
     @parse_path
     def add_album(self, path: Path, performer=None, inside_ok=False, delete_src=False, interactive=True):
         if not path.is_dir():
             ui.show(f'Is not dir: {path.name}')
             return
 
-        if not inside_ok and path in self._path.rglob(path.name):
+        # every library album lives inside the library folder, so no filesystem walk is needed
+        if not inside_ok and self._path in path.parents:
             ui.show(f'Album already exists')
             return
 
-        cue, cue_path = self._get_cue(path)
-        tracks = self._get_tracks(path, cue, interactive)
-        if tracks is None:
+        probe = self._prober.probe(path)
+        tracks = self._get_tracks(path, probe, interactive)
+        if tracks is None or len(tracks) == 0:
             ui.show('Tracks not found')
             return
         if performer is None:
-            performer = self._get_performer(cue)
-        year, title = self._get_year_and_title(path, cue)
+            performer = self._get_performer(probe)
+        year, title = self._get_year_and_title(path, probe)
         if interactive:
             normalized_metadata = self._normalize_album_metadata(performer, year, title)
             if normalized_metadata is None:
                 return
             performer, year, title = normalized_metadata
-        cover = self._get_or_download_cover(performer, title, path)
-        cue_name = None if cue_path is None else cue_path.name
+        if performer in self._library and Album(performer, year, title) in self._library[performer]:
+            ui.show(f'Album already exists')
+            return
+        cover = self._get_or_download_cover(performer, title, path, probe)
         cover_name = None if cover is None else cover.name
-        album = Album(performer, year, title, tracks, cue_name, cover_name)
+        album = Album(performer, year, title, tracks, probe.cue_name, cover_name)
         try:
             if not album.get_location(self._path).exists():
                 self._copy_album_to_library(album, path)
@@ -312,16 +501,158 @@ class MusicLibrary:
         except OSError as e:
             ui.show(str(e))
             return
-        self._library[performer].append(album)
-        ui.show(f'Successfully added {year} - {title} to {performer}\n')
-
-    def _is_folder_with_tracks(self, path: Path):
-        return any(p.suffix in self.supported_types for p in path.iterdir() if p.is_file())
+        if self._register_album(album):
+            ui.show(f'Successfully added {year} - {title} to {performer}\n')
 
+    def _register_album(self, album: Album):
+        try:
+            self._storage.add_album(album)
+        except sqlite3.IntegrityError:
+            ui.show(f'{album.performer} - {album} already exists in the library')
+            return False
+        self._library[album.performer].append(album)
+        return True
+
+    @synchronized
     @parse_path
     def add_folder(self, path):
-        if self._is_folder_with_tracks(path):
-            self.add_album(path)
-        for path in path.iterdir():
-            if path.is_dir():
-                self.add_folder(path)
+        self._scanner.reset_timings()
+        with self._scanner.phase('importing folder'):
+            for album_dir in self._scanner.iter_album_candidates(path):
+                self.add_album(album_dir)
+        ui.show(self._scanner.report())
+
+    def _probe_candidate(self, path: Path, overrides=None) -> AlbumCandidate:
+        candidate = AlbumCandidate(path)
+        try:
+            candidate.probe = self._prober.probe(path)
+            candidate.tracks = self._get_tracks(path, candidate.probe, interactive=False)
+            candidate.cue_name = candidate.probe.cue_name
+            candidate.performer = self._infer_performer(candidate.probe)
+            if candidate.performer is None and ALBUM_RE.match(path.name) is not None:
+                candidate.performer = with_upper_first_letter(path.parent.name)
+            candidate.year, candidate.title = self._infer_year_and_title(path, candidate.probe)
+        except Exception as e:
+            candidate.problems.append(f'unreadable metadata: {e}')
+            return candidate
+
+        for key, value in (overrides or {}).items():
+            if value not in (None, ''):
+                try:
+                    setattr(candidate, key, int(value) if key == 'year' else with_upper_first_letter(str(value)))
+                except ValueError:
+                    candidate.problems.append(f'invalid {key} {value!r}')
+        if len(candidate.tracks) == 0:
+            candidate.problems.append('tracks not found')
+        if candidate.performer is None:
+            candidate.problems.append('unknown performer')
+        if candidate.year is None:
+            candidate.problems.append('unknown year')
+        if candidate.resolved:
+            try:
+                cover = self._get_or_download_cover(candidate.performer, candidate.title, path, candidate.probe)
+            except Exception as e:
+                candidate.problems.append(f'cover failed: {e}')
+            else:
+                candidate.cover_name = None if cover is None else cover.name
+        return candidate
+
+    def _check_duplicates(self, candidates):
+        seen = set()
+        for candidate in candidates:
+            if not candidate.resolved:
+                continue
+            album = candidate.to_album()
+            key = (candidate.performer.lower(), album)
+            if candidate.performer in self._library and album in self._library[candidate.performer]:
+                candidate.problems.append('already in library')
+            elif key in seen:
+                candidate.problems.append('duplicate in this import')
+            seen.add(key)
+
+    def _review_candidate(self, candidate: AlbumCandidate):
+        ui.show(str(candidate))
+        if candidate.tracks is None or len(candidate.tracks) == 0:
+            return False
+        performer = candidate.performer or self._get_performer_from_user()
+        year = candidate.year or int(ui.get_input_from_user('Enter title release date', read_int=True))
+        metadata = self._normalize_album_metadata(performer, year, candidate.title)
+        if metadata is None:
+            return False
+        candidate.performer, candidate.year, candidate.title = metadata
+        candidate.problems.clear()
+        cover = self._get_or_download_cover(candidate.performer, candidate.title, candidate.path, candidate.probe)
+        candidate.cover_name = None if cover is None else cover.name
+        return True
+
+    def _import_candidates(self, candidates: List[AlbumCandidate]):
+        failed = set()
+
+        def on_error(path, exc_info):
+            failed.add(path)
+            log_err(path, exc_info)
+
+        scheduler = CopyScheduler(get_copy_workers(), get_copy_workers_per_device(), onerror=on_error)
+        copies = []
+        for candidate in candidates:
+            album = candidate.to_album()
+            destination = album.get_location(self._path)
+            files = [] if destination.exists() else self._get_album_files(album, candidate.path)
+            destination.mkdir(parents=True, exist_ok=True)
+            for src in files:
+                scheduler.add(src, destination)
+            copies.append((album, [abspath(f) for f in files]))
+        scheduler.run(f'Importing {len(candidates)} albums')
+
+        imported = 0
+        for album, files in copies:
+            if any(f in failed for f in files):
+                ui.show(f'Failed to import {album.performer} - {album}')
+                continue
+            if self._register_album(album):
+                imported += 1
+        return imported
+
+    @synchronized
+    @parse_path
+    def import_folder(self, path):
+        overrides = {}
+        if path.is_file():
+            overrides = read_review_file(path)
+            album_dirs = [p for p in overrides if p.is_dir()]
+        else:
+            album_dirs = list(self._scanner.iter_album_candidates(path))
+        album_dirs = [p for p in album_dirs if self._path not in p.parents]
+        if len(album_dirs) == 0:
+            ui.show('Albums not found')
+            return
+
+        with ThreadPoolExecutor(get_scan_workers()) as pool:
+            candidates = list(pool.map(lambda p: self._probe_candidate(p, overrides.get(p)), album_dirs))
+        self._check_duplicates(candidates)
+        ready = [c for c in candidates if c.resolved]
+        unresolved = [c for c in candidates if not c.resolved]
+
+        review_file = self._path.joinpath('library.review.json')
+        summary = '\n'.join(str(c) for c in unresolved[:50])
+        if len(unresolved) > 50:
+            summary += f'\n... and {len(unresolved) - 50} more'
+        i, _ = ui.choose(f'Found {len(candidates)} albums: {len(ready)} ready to import, '
+                         f'{len(unresolved)} need review\n{summary}',
+                         ['import ready albums and write the rest to review file',
+                          'review the rest one by one', 'abort operation'], ['ok', 'r', 'ex'])
+        if i == 2:
+            return
+        if i == 1:
+            reviewed = [c for c in unresolved if self._review_candidate(c)]
+            self._check_duplicates(ready + reviewed)
+            ready.extend(c for c in reviewed if c.resolved)
+            unresolved = [c for c in unresolved if not c.resolved]
+        if len(unresolved) > 0:
+            write_review_file(review_file, unresolved)
+            ui.show(f'{len(unresolved)} albums written to {review_file}, fix them and import this file')
+        elif path == review_file:
+            review_file.unlink()
+
+        imported = self._import_candidates(ready) if len(ready) > 0 else 0
+        ui.show(f'Imported {imported} of {len(candidates)} albums')
@@ -0,0 +1,89 @@
+import os
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Iterable, Iterator, List, NamedTuple
+
+__all__ = ['LibraryScanner', 'DirectoryListing']
+
+
+class DirectoryListing(NamedTuple):
+    path: Path
+    dirs: List[Path]
+    files: List[str]
+    has_tracks: bool
+
+
+class LibraryScanner:
+    def __init__(self, track_extensions, workers=8):
+        self._track_extensions = tuple(track_extensions)
+        self._workers = max(1, workers)
+        self._lock = Lock()
+        self._timings = OrderedDict()
+        self._listed = 0
+        self._listing_time = 0
+
+    def list_dir(self, path: Path) -> DirectoryListing:
+        start = perf_counter()
+        dirs, files = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            dirs.append(path.joinpath(entry.name))
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            pass
+        dirs.sort()
+        has_tracks = any(os.path.splitext(f)[1] in self._track_extensions for f in files)
+        with self._lock:
+            self._listed += 1
+            self._listing_time += perf_counter() - start
+        return DirectoryListing(path, dirs, files, has_tracks)
+
+    def list_dirs(self, paths: Iterable[Path]) -> Iterator[DirectoryListing]:
+        paths = iter(paths)
+        with ThreadPoolExecutor(self._workers) as pool:
+            pending = deque(pool.submit(self.list_dir, p) for p in islice(paths, self._workers * 2))
+            while pending:
+                listing = pending.popleft().result()
+                pending.extend(pool.submit(self.list_dir, p) for p in islice(paths, 1))
+                yield listing
+
+    def walk(self, root: Path) -> Iterator[DirectoryListing]:
+        # depth-first in name order like a recursive walk, while subfolders are already being listed on the pool
+        with ThreadPoolExecutor(self._workers) as pool:
+            stack = [pool.submit(self.list_dir, root)]
+            while stack:
+                listing = stack.pop().result()
+                stack.extend(reversed([pool.submit(self.list_dir, d) for d in listing.dirs]))
+                yield listing
+
+    def iter_album_candidates(self, root: Path) -> Iterator[Path]:
+        return (listing.path for listing in self.walk(root) if listing.has_tracks)
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._timings[name] = self._timings.get(name, 0) + perf_counter() - start
+
+    def reset_timings(self):
+        self._timings.clear()
+        self._listed = 0
+        self._listing_time = 0
+
+    def report(self):
+        phases = ', '.join(f'{name} {elapsed:.2f}s' for name, elapsed in self._timings.items())
+        return (f'Scan timings: {phases}\n'
+                f'Listed {self._listed} folders in {self._listing_time:.2f}s of worker time ({self._workers} workers)')
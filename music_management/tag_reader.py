@@ -0,0 +1,207 @@
+import os
+import struct
+from typing import Dict, NamedTuple, Optional
+
+__all__ = ['AudioInfo', 'read_audio_info']
+
+MAX_TEXT_FRAME = 64 * 1024
+MP3_SYNC_SEARCH = 64 * 1024
+
+ID3_FRAMES = {
+    'TIT2': 'title', 'TPE1': 'artist', 'TPE2': 'albumartist', 'TALB': 'album', 'TYER': 'date', 'TDRC': 'date',
+    'TRCK': 'tracknumber', 'TT2': 'title', 'TP1': 'artist', 'TP2': 'albumartist', 'TAL': 'album', 'TYE': 'date',
+    'TRK': 'tracknumber',
+}
+RIFF_INFO = {b'INAM': 'title', b'IART': 'artist', b'IPRD': 'album', b'ICRD': 'date', b'ITRK': 'tracknumber'}
+
+# bitrates in kbps by [mpeg1][bitrate index] for layer III
+MP3_BITRATES = {
+    True: (None, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (None, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+class AudioInfo(NamedTuple):
+    duration: Optional[float]
+    bitrate: Optional[int]
+    sample_rate: Optional[int]
+    channels: Optional[int]
+    size: int
+    tags: Dict[str, str]
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_text(data):
+    encoding, data = data[0], data[1:]
+    if encoding == 0:
+        text = data.decode('latin-1')
+    elif encoding == 1:
+        text = data.decode('utf-16')
+    elif encoding == 2:
+        text = data.decode('utf-16-be')
+    else:
+        text = data.decode('utf-8')
+    return text.split('\0')[0].strip()
+
+
+def _read_id3(f, tags):
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        f.seek(0)
+        return 0
+    version, flags, tag_size = header[3], header[5], _syncsafe(header[6:10])
+    end = 10 + tag_size
+    if version == 2:
+        id_size, header_size = 3, 6
+    else:
+        id_size, header_size = 4, 10
+        if flags & 0x40:
+            extended = f.read(4)
+            f.seek(_syncsafe(extended) - 4 if version == 4 else struct.unpack('>I', extended)[0], os.SEEK_CUR)
+
+    while f.tell() + header_size <= end:
+        frame = f.read(header_size)
+        if frame[0] == 0:
+            break
+        frame_id = frame[:id_size].decode('latin-1', 'replace')
+        if version == 2:
+            size = int.from_bytes(frame[3:6], 'big')
+        elif version == 4:
+            size = _syncsafe(frame[4:8])
+        else:
+            size = struct.unpack('>I', frame[4:8])[0]
+        key = ID3_FRAMES.get(frame_id)
+        if key is not None and 0 < size <= MAX_TEXT_FRAME and key not in tags:
+            try:
+                tags[key] = _decode_text(f.read(size))
+            except (UnicodeDecodeError, IndexError):
+                pass
+        else:
+            f.seek(size, os.SEEK_CUR)
+    return end
+
+
+def _read_mp3(f, size):
+    tags = {}
+    audio_start = _read_id3(f, tags)
+    f.seek(audio_start)
+    data = f.read(MP3_SYNC_SEARCH)
+    for i in range(len(data) - 4):
+        if data[i] != 0xFF or data[i + 1] & 0xE0 != 0xE0:
+            continue
+        version = (data[i + 1] >> 3) & 0x03
+        layer = (data[i + 1] >> 1) & 0x03
+        bitrate_index = data[i + 2] >> 4
+        rate_index = (data[i + 2] >> 2) & 0x03
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            continue
+        mpeg1 = version == 3
+        bitrate = MP3_BITRATES[mpeg1][bitrate_index]
+        sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+        mono = data[i + 3] >> 6 == 3
+        samples_per_frame = 1152 if mpeg1 else 576
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        xing = data[i + 4 + side_info:i + 4 + side_info + 12]
+        if xing[:4] in (b'Xing', b'Info') and struct.unpack('>I', xing[4:8])[0] & 0x01:
+            frames = struct.unpack('>I', xing[8:12])[0]
+            duration = frames * samples_per_frame / sample_rate
+            bitrate = round((size - audio_start - i) * 8 / duration / 1000) if duration > 0 else bitrate
+        else:
+            duration = (size - audio_start - i) * 8 / (bitrate * 1000)
+        return AudioInfo(duration, bitrate, sample_rate, 1 if mono else 2, size, tags)
+    return AudioInfo(None, None, None, None, size, tags)
+
+
+def _read_vorbis_comments(data, tags):
+    vendor_length = struct.unpack('<I', data[:4])[0]
+    offset = 4 + vendor_length
+    count = struct.unpack('<I', data[offset:offset + 4])[0]
+    offset += 4
+    for _ in range(count):
+        length = struct.unpack('<I', data[offset:offset + 4])[0]
+        comment = data[offset + 4:offset + 4 + length].decode('utf-8', 'replace')
+        offset += 4 + length
+        key, _, value = comment.partition('=')
+        if key.lower() not in tags:
+            tags[key.lower()] = value.strip()
+
+
+def _read_flac(f, size):
+    if f.read(4) != b'fLaC':
+        return None
+    tags = {}
+    sample_rate, channels, duration = None, None, None
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        last, block_type, length = header[0] & 0x80, header[0] & 0x7F, int.from_bytes(header[1:4], 'big')
+        if block_type == 0:
+            info = f.read(length)
+            sample_rate = int.from_bytes(info[10:13], 'big') >> 4
+            channels = ((info[12] >> 1) & 0x07) + 1
+            total_samples = ((info[13] & 0x0F) << 32) | struct.unpack('>I', info[14:18])[0]
+            duration = total_samples / sample_rate if sample_rate > 0 and total_samples > 0 else None
+        elif block_type == 4 and length <= MAX_TEXT_FRAME * 16:
+            _read_vorbis_comments(f.read(length), tags)
+        else:
+            f.seek(length, os.SEEK_CUR)
+        if last:
+            break
+    bitrate = round(size * 8 / duration / 1000) if duration else None
+    return AudioInfo(duration, bitrate, sample_rate, channels, size, tags)
+
+
+def _read_wav(f, size):
+    header = f.read(12)
+    if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return None
+    tags = {}
+    sample_rate, channels, byte_rate, duration = None, None, None, None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, length = chunk[:4], struct.unpack('<I', chunk[4:8])[0]
+        if chunk_id == b'fmt ':
+            fmt = f.read(length)
+            channels, sample_rate, byte_rate = struct.unpack('<HII', fmt[2:12])
+        elif chunk_id == b'data':
+            if byte_rate:
+                duration = min(length, size - f.tell()) / byte_rate
+            f.seek(length, os.SEEK_CUR)
+        elif chunk_id == b'LIST' and length <= MAX_TEXT_FRAME:
+            data = f.read(length)
+            if data[:4] == b'INFO':
+                offset = 4
+                while offset + 8 <= len(data):
+                    sub_id, sub_length = data[offset:offset + 4], struct.unpack('<I', data[offset + 4:offset + 8])[0]
+                    key = RIFF_INFO.get(sub_id)
+                    if key is not None:
+                        tags[key] = data[offset + 8:offset + 8 + sub_length].split(b'\0')[0].decode('latin-1').strip()
+                    offset += 8 + sub_length + sub_length % 2
+        else:
+            f.seek(length, os.SEEK_CUR)
+        if length % 2:
+            f.seek(1, os.SEEK_CUR)
+    bitrate = byte_rate * 8 // 1000 if byte_rate else None
+    return AudioInfo(duration, bitrate, sample_rate, channels, size, tags)
+
+
+_readers = {'.mp3': _read_mp3, '.flac': _read_flac, '.wav': _read_wav}
+
+
+def read_audio_info(path) -> Optional[AudioInfo]:
+    reader = _readers.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        return None
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            return reader(f, size)
+    except (OSError, struct.error, IndexError, ValueError, ZeroDivisionError):
+        return None
@@ -1,14 +1,66 @@
+from os.path import splitext
+from sys import intern
+
 __all__ = ['Track']
 
+_FIELDS = ('name', 'path', 'offset', 'duration', 'bitrate', 'sample_rate', 'channels', 'size')
+
 
 class Track:
-    def __init__(self, name, path, offset='00:00:00'):
-        self.name = name
+    # a library holds hundreds of thousands of tracks, so they have no __dict__ and share repeated strings
+    __slots__ = ('_name', '_path', '_suffix', 'offset', 'duration', 'bitrate', 'sample_rate', 'channels', 'size')
+
+    def __init__(self, name, path, offset='00:00:00', duration=None, bitrate=None, sample_rate=None, channels=None,
+                 size=None):
+        self._name = name
         self.path = path
-        self.offset = offset
+        self.offset = intern(offset)
+        self.duration = duration
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.size = size
+
+    @property
+    def name(self):
+        # the path may be stored as the name plus extension, so renaming would move the file reference
+        return self._name
+
+    @property
+    def path(self):
+        return self.name + self._suffix if self._path is None else self._path
+
+    @path.setter
+    def path(self, value):
+        # most tracks are named after their file, so only the interned extension is kept
+        stem, suffix = splitext(value)
+        if len(suffix) > 0 and stem == self.name:
+            self._path, self._suffix = None, intern(suffix)
+        else:
+            # tracks of a CUE sheet share the same file
+            self._path, self._suffix = intern(value), None
+
+    @property
+    def offset_seconds(self):
+        minutes, seconds, frames = (int(p) for p in self.offset.split(':'))
+        return minutes * 60 + seconds + frames / 75
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in _FIELDS)
+
+    def __setstate__(self, state):
+        # pickles made before __slots__ hold the instance __dict__, which may lack newer fields
+        if isinstance(state, dict):
+            self.__init__(**state)
+        else:
+            self.__init__(*state)
 
     def __str__(self):
-        return f'{self.name:30} located at [{self.offset}] {self.path}'
+        result = f'{self.name:30} located at [{self.offset}] {self.path}'
+        if self.duration is not None:
+            result += f' ({int(self.duration // 60)}:{int(self.duration % 60):02d}'
+            result += f', {self.bitrate} kbps)' if self.bitrate is not None else ')'
+        return result
 
     def __repr__(self):
         return str(self)
@@ -1,4 +1,5 @@
 from json import load
+from pathlib import Path
 
 with open('settings.json') as f:
     settings = load(f)
@@ -10,9 +11,128 @@ def extract_value(key):
     raise ValueError(f'Not found {key} in settings.json')
 
 
+def extract_optional_value(key, default):
+    value = settings.get(key, '')
+    return default if value == '' else value
+
+
 def get_last_fm_api_key():
     return extract_value('last_fm_api_key')
 
 
 def get_google_api_key():
     return extract_value('google_api_key_with_youtube_support')
+
+
+def get_scan_workers():
+    return int(extract_optional_value('scan_workers', 8))
+
+
+def get_export_verify_hash():
+    return bool(extract_optional_value('export_verify_hash', False))
+
+
+def get_copy_workers():
+    return int(extract_optional_value('copy_workers', 4))
+
+
+def get_copy_workers_per_device():
+    return int(extract_optional_value('copy_workers_per_device', 0))
+
+
+def get_backup_mode():
+    return extract_optional_value('backup_mode', 'stream')
+
+
+def get_backup_workers():
+    return int(extract_optional_value('backup_workers', 4))
+
+
+def get_webdav_url():
+    return extract_optional_value('webdav_url', None)
+
+
+def get_upload_chunk_size():
+    return int(extract_optional_value('upload_chunk_size_mb', 16)) * 1024 * 1024
+
+
+def get_upload_retries():
+    return int(extract_optional_value('upload_retries', 5))
+
+
+def get_http_connections_limit():
+    return int(extract_optional_value('http_connections_limit', 64))
+
+
+def get_http_connections_per_host():
+    return int(extract_optional_value('http_connections_per_host', 8))
+
+
+def get_download_workers():
+    return int(extract_optional_value('download_workers', 4))
+
+
+def get_convert_workers():
+    return int(extract_optional_value('convert_workers', 0))
+
+
+def get_stream_conversion():
+    return bool(extract_optional_value('stream_conversion', True))
+
+
+def get_cache_dir():
+    path = Path(extract_optional_value('cache_location', Path.home().joinpath('.cache', 'music_manager')))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def get_youtube_cache_size():
+    return int(extract_optional_value('youtube_cache_size', 50000))
+
+
+def get_youtube_api_url():
+    return extract_optional_value('youtube_api_url', 'https://www.googleapis.com/youtube/v3').rstrip('/')
+
+
+def get_youtube_requests_per_second():
+    return float(extract_optional_value('youtube_requests_per_second', 5))
+
+
+def get_youtube_daily_quota():
+    return int(extract_optional_value('youtube_daily_quota', 10000))
+
+
+def get_youtube_max_concurrency():
+    return int(extract_optional_value('youtube_max_concurrency', 8))
+
+
+def get_last_fm_workers():
+    return int(extract_optional_value('last_fm_workers', 8))
+
+
+def get_last_fm_cache_size():
+    return int(extract_optional_value('last_fm_cache_size', 200)) * 1024 * 1024
+
+
+def get_extract_workers():
+    return int(extract_optional_value('extract_workers', 4))
+
+
+def get_download_chunk_size():
+    return int(extract_optional_value('download_chunk_size', 256)) * 1024
+
+
+def get_download_segments():
+    return int(extract_optional_value('download_segments', 1))
+
+
+def get_queue_workers():
+    return int(extract_optional_value('queue_workers', 2))
+
+
+def get_download_bandwidth_limit():
+    return int(extract_optional_value('download_bandwidth_limit', 0)) * 1024
+
+
+def get_download_attempts():
+    return int(extract_optional_value('download_attempts', 3))
@@ -1,9 +1,12 @@
+import threading
 from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
 from typing import Tuple
 
 from console_progressbar import ProgressBar
 
-__all__ = ['ui', 'set_ui', 'ConsoleUI']
+__all__ = ['ui', 'set_ui', 'set_thread_ui', 'ConsoleUI', 'BackgroundUI']
 
 
 class AbstractProgressBar(ABC):
@@ -36,14 +39,22 @@ class AbstractUI(ABC):
 class UIProxy:
     def __init__(self):
         self._ui = None
+        self._local = threading.local()
 
     def set_ui(self, concrete_ui):
         self._ui = concrete_ui
 
+    def set_thread_ui(self, concrete_ui):
+        self._local.ui = concrete_ui
+
+    def get_thread_ui(self):
+        return getattr(self._local, 'ui', None)
+
     def __getattr__(self, item):
-        if self._ui is None:
+        concrete_ui = getattr(self._local, 'ui', None) or self._ui
+        if concrete_ui is None:
             raise NotImplementedError('UI no specified. Call set_ui() before use module')
-        return getattr(self._ui, item)
+        return getattr(concrete_ui, item)
 
 
 ui: AbstractUI = UIProxy()
@@ -53,6 +64,10 @@ def set_ui(concrete_ui):
     ui.set_ui(concrete_ui)
 
 
+def set_thread_ui(concrete_ui):
+    ui.set_thread_ui(concrete_ui)
+
+
 class ConsoleUI(AbstractUI):
     def get_progress_bar(self, msg) -> AbstractProgressBar:
         return ProgressBar(100, length=50, suffix=msg)
@@ -101,3 +116,30 @@ class ConsoleUI(AbstractUI):
                     self.show(str(e))
                     continue
             return result
+
+
+class _SilentProgressBar(AbstractProgressBar):
+    def print_progress_bar(self, percent):
+        pass
+
+
+class BackgroundUI(AbstractUI):
+    def __init__(self, max_lines=200):
+        self._lines = deque(maxlen=max_lines)
+
+    @property
+    def lines(self):
+        return list(self._lines)
+
+    def get_progress_bar(self, msg) -> AbstractProgressBar:
+        return _SilentProgressBar()
+
+    def show(self, msg):
+        time = datetime.now().strftime('%H:%M:%S')
+        self._lines.extend(f'{time} {line}' for line in str(msg).splitlines() if line.strip() != '')
+
+    def choose(self, msg, options, indexes=None) -> Tuple[int, str]:
+        raise RuntimeError(f'Input required: {msg.splitlines()[0]}')
+
+    def get_input_from_user(self, msg, read_int=False, validation_func=None, input_func=None):
+        raise RuntimeError(f'Input required: {msg}')
@@ -1,4 +1,5 @@
 import os
+from threading import Lock
 from ui import ui
 
 
@@ -23,18 +24,25 @@ class ProgressTracker:
         self._next_update_border = 0
         self._update_frequency = update_frequency
         self._closed = False
+        self._lock = Lock()
 
     def add_progress(self, count):
-        if self._closed:
-            return
-        self._current_size += count
-        percent = self._current_size / self._total_size * 100
-        if percent > 99:
-            return
-        if percent >= self._next_update_border:
-            self._next_update_border = max(self._next_update_border + self._update_frequency,
-                                           percent // self._update_frequency + self._update_frequency)
-            self._pb.print_progress_bar(percent)
+        with self._lock:
+            if self._closed:
+                return
+            self._current_size += count
+            percent = self._current_size / self._total_size * 100
+            if percent > 99:
+                return
+            if percent >= self._next_update_border:
+                self._next_update_border = max(self._next_update_border + self._update_frequency,
+                                               percent // self._update_frequency + self._update_frequency)
+                self._pb.print_progress_bar(percent)
+
+    def set_progress(self, size):
+        with self._lock:
+            self._current_size = size
+            self._next_update_border = 0
 
     def reset(self, total_size=None, msg=None):
         self._closed = False
@@ -45,8 +53,9 @@ class ProgressTracker:
             self._total_size = total_size
 
     def close(self):
-        if self._closed:
-            return
-        self._closed = True
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
         self._pb.print_progress_bar(100)
         ui.show('')